@@ -4,6 +4,8 @@
 bind = "127.0.0.1:5000"
 
 workers = 1
+# 密码哈希在独立的进程池里计算（见 PASSWORD_HASH_WORKERS 配置），配合多线程 worker 才能并发处理登录请求
+# threads = 4
 backlog = 2048
 # 默认是sync，同步模式，eventlet 是异步模式，要通过pip安装eventlet>=0.24.1
 # worker_class = "eventlet"
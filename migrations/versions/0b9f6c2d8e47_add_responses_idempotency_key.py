@@ -0,0 +1,32 @@
+"""add responses.idempotency_key
+
+Revision ID: 0b9f6c2d8e47
+Revises: e7b3d5a9c482
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9f6c2d8e47'
+down_revision = 'e7b3d5a9c482'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('responses')]
+    if 'idempotency_key' not in columns:
+        with op.batch_alter_table('responses', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+            batch_op.create_unique_constraint(
+                'uq_responses_user_id_idempotency_key', ['user_id', 'idempotency_key']
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_responses_user_id_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
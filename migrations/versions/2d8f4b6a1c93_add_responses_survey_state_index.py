@@ -0,0 +1,32 @@
+"""add (survey_id, is_reviewed, is_completed) index to responses
+
+Revision ID: 2d8f4b6a1c93
+Revises: 7c3e5b1f9a08
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8f4b6a1c93'
+down_revision = '7c3e5b1f9a08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里索引已经存在
+    indexes = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('responses')]
+    if 'ix_responses_survey_id_is_reviewed_is_completed' not in indexes:
+        op.create_index(
+            'ix_responses_survey_id_is_reviewed_is_completed',
+            'responses',
+            ['survey_id', 'is_reviewed', 'is_completed'],
+            unique=False,
+        )
+
+
+def downgrade():
+    op.drop_index('ix_responses_survey_id_is_reviewed_is_completed', table_name='responses')
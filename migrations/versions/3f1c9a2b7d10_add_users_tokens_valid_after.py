@@ -0,0 +1,29 @@
+"""add users.tokens_valid_after
+
+Revision ID: 3f1c9a2b7d10
+Revises:
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里这一列已经存在
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')]
+    if 'tokens_valid_after' not in columns:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('tokens_valid_after', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('tokens_valid_after')
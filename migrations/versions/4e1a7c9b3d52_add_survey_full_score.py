@@ -0,0 +1,50 @@
+"""add surveys.full_score and survey_revisions.full_score
+
+Revision ID: 4e1a7c9b3d52
+Revises: 0b9f6c2d8e47
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1a7c9b3d52'
+down_revision = '0b9f6c2d8e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table in ('surveys', 'survey_revisions'):
+        columns = [column['name'] for column in inspector.get_columns(table)]
+        if 'full_score' not in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('full_score', sa.Float(), nullable=False, server_default='0'))
+
+    # 问卷的满分按未被逻辑删除的题目计算，问卷版本的满分按冻结的内容计算
+    bind.execute(
+        sa.text(
+            'UPDATE surveys SET full_score = ('
+            'SELECT COALESCE(SUM(score), 0) FROM questions '
+            'WHERE questions.survey_id = surveys.id AND (logical_deletion IS NULL OR logical_deletion = 0))'
+        )
+    )
+    rows = bind.execute(sa.text('SELECT id, content FROM survey_revisions')).all()
+    for row in rows:
+        full_score = sum(question['score'] for question in json.loads(row.content)['questions'])
+        bind.execute(
+            sa.text('UPDATE survey_revisions SET full_score = :full_score WHERE id = :id'),
+            {'full_score': full_score, 'id': row.id},
+        )
+
+
+def downgrade():
+    for table in ('survey_revisions', 'surveys'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('full_score')
@@ -0,0 +1,36 @@
+"""add users.play_permission
+
+Revision ID: 5a9f1e3c2b68
+Revises: e2a8c4f60d57
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f1e3c2b68'
+down_revision = 'e2a8c4f60d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')]
+    if 'play_permission' not in columns:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('play_permission', sa.Boolean(), nullable=False, server_default=sa.false())
+            )
+
+    # 按现有白名单回填
+    op.execute(
+        'UPDATE users SET play_permission = '
+        'EXISTS (SELECT 1 FROM whitelist WHERE whitelist.user_id = users.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('play_permission')
@@ -0,0 +1,35 @@
+"""add responses.submitted_score
+
+Revision ID: 5f2a9d7e3b14
+Revises: 2d8f4b6a1c93
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a9d7e3b14'
+down_revision = '2d8f4b6a1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('responses')]
+    if 'submitted_score' not in columns:
+        with op.batch_alter_table('responses', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('submitted_score', sa.Float(), nullable=True))
+
+    # 已经带 Idempotency-Key 提交的答卷按当前的题目得分补上，重试时和之前返回的结果一致
+    op.execute(
+        'UPDATE responses SET submitted_score = '
+        '(SELECT COALESCE(SUM(score), 0) FROM response_scores WHERE response_scores.response_id = responses.id) '
+        'WHERE idempotency_key IS NOT NULL AND is_completed = 1 AND submitted_score IS NULL'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_column('submitted_score')
@@ -0,0 +1,27 @@
+"""add create_time index to responses
+
+Revision ID: 7c3e5b1f9a08
+Revises: 4e1a7c9b3d52
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5b1f9a08'
+down_revision = '4e1a7c9b3d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里索引已经存在
+    indexes = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('responses')]
+    if 'ix_responses_create_time' not in indexes:
+        op.create_index('ix_responses_create_time', 'responses', ['create_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_responses_create_time', table_name='responses')
@@ -0,0 +1,36 @@
+"""add expires_at indexes to token tables
+
+Revision ID: 8b4e2d6f1a23
+Revises: 3f1c9a2b7d10
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2d6f1a23'
+down_revision = '3f1c9a2b7d10'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('token', 'ix_token_expires_at', ['expires_at']),
+    ('token', 'ix_token_is_revoked_expires_at', ['is_revoked', 'expires_at']),
+    ('reset_password_token', 'ix_reset_password_token_expires_at', ['expires_at']),
+    ('activation_token', 'ix_activation_token_expires_at', ['expires_at']),
+]
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里索引已经存在
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in INDEXES:
+        if name not in [index['name'] for index in inspector.get_indexes(table)]:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for table, name, _ in INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,34 @@
+"""store users.tokens_valid_after with microseconds
+
+Revision ID: 9b4d2e6f1a37
+Revises: 5f2a9d7e3b14
+Create Date: 2026-10-19 02:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d2e6f1a37'
+down_revision = '5f2a9d7e3b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 只有 MySQL 的 DATETIME 默认不保存小数秒，SQLite 等本来就保留微秒
+    if op.get_bind().dialect.name == 'mysql':
+        op.alter_column(
+            'users', 'tokens_valid_after',
+            existing_type=mysql.DATETIME(), type_=mysql.DATETIME(fsp=6), existing_nullable=True,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.alter_column(
+            'users', 'tokens_valid_after',
+            existing_type=mysql.DATETIME(fsp=6), type_=mysql.DATETIME(), existing_nullable=True,
+        )
@@ -0,0 +1,28 @@
+"""add surveys.version
+
+Revision ID: 9d6b3f7a4c15
+Revises: 5a9f1e3c2b68
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d6b3f7a4c15'
+down_revision = '5a9f1e3c2b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('surveys')]
+    if 'version' not in columns:
+        with op.batch_alter_table('surveys', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('surveys', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,112 @@
+"""pack response_details into one response_answers row per response
+
+response_details.create_time is not carried over: the packed row gets its own create_time when it is written,
+and downgrade recreates response_details rows with the time of the downgrade.
+
+Revision ID: a6d2f8c4e951
+Revises: f5c2e9a7b130
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f8c4e951'
+down_revision = 'f5c2e9a7b130'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 100
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'response_answers' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'response_answers',
+            sa.Column('response_id', sa.Integer(), nullable=False),
+            sa.Column('answers', sa.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=False),
+            sa.Column('create_time', sa.DateTime(), server_default=sa.text('(utc_timestamp())'), nullable=True),
+            sa.ForeignKeyConstraint(['response_id'], ['responses.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('response_id'),
+        )
+
+    # 按答卷分批打包，同一道题的多个答案保持原来的写入顺序，打包后删除原来的行
+    last_id = 0
+    while True:
+        response_ids = bind.execute(
+            sa.text(
+                'SELECT DISTINCT response_id FROM response_details '
+                'WHERE response_id > :last_id AND response_id NOT IN (SELECT response_id FROM response_answers) '
+                'ORDER BY response_id LIMIT :limit'
+            ),
+            {'last_id': last_id, 'limit': BATCH_SIZE},
+        ).scalars().all()
+        if not response_ids:
+            break
+
+        rows = bind.execute(
+            sa.text(
+                'SELECT response_id, question_id, answer FROM response_details '
+                'WHERE response_id IN :ids ORDER BY id'
+            ).bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': response_ids},
+        ).all()
+        packed: dict[int, dict[str, list[str]]] = {}
+        for row in rows:
+            packed.setdefault(row.response_id, {}).setdefault(str(row.question_id), []).append(row.answer)
+
+        bind.execute(
+            sa.text('INSERT INTO response_answers (response_id, answers) VALUES (:response_id, :answers)'),
+            [
+                {'response_id': response_id, 'answers': json.dumps(answers, ensure_ascii=False)}
+                for response_id, answers in packed.items()
+            ],
+        )
+        bind.execute(
+            sa.text('DELETE FROM response_details WHERE response_id IN :ids').bindparams(
+                sa.bindparam('ids', expanding=True)
+            ),
+            {'ids': response_ids},
+        )
+        last_id = response_ids[-1]
+
+
+def downgrade():
+    # 按答卷分批拆回 response_details，拆完的答卷立刻删除打包的行，中途失败后重新执行不会产生重复的答案
+    bind = op.get_bind()
+    while True:
+        rows = bind.execute(
+            sa.text('SELECT response_id, answers FROM response_answers ORDER BY response_id LIMIT :limit'),
+            {'limit': BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+
+        details = [
+            {'response_id': row.response_id, 'question_id': int(question_id), 'answer': answer}
+            for row in rows
+            for question_id, answers in json.loads(row.answers).items()
+            for answer in answers
+        ]
+        if details:
+            bind.execute(
+                sa.text(
+                    'INSERT INTO response_details (response_id, question_id, answer) '
+                    'VALUES (:response_id, :question_id, :answer)'
+                ),
+                details,
+            )
+        bind.execute(
+            sa.text('DELETE FROM response_answers WHERE response_id IN :ids').bindparams(
+                sa.bindparam('ids', expanding=True)
+            ),
+            {'ids': [row.response_id for row in rows]},
+        )
+
+    op.drop_table('response_answers')
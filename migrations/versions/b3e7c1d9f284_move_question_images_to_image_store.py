@@ -0,0 +1,78 @@
+"""move base64 question images into the content-addressed image store
+
+Revision ID: b3e7c1d9f284
+Revises: 9d6b3f7a4c15
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from myapp.image_store import decode_image_data, store_image
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7c1d9f284'
+down_revision = '9d6b3f7a4c15'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 100
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = [column['name'] for column in sa.inspect(bind).get_columns('question_images')]
+    if 'img_hash' not in columns:
+        with op.batch_alter_table('question_images', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('img_hash', sa.String(length=64), nullable=True))
+            batch_op.create_index('ix_question_images_img_hash', ['img_hash'], unique=False)
+    with op.batch_alter_table('question_images', schema=None) as batch_op:
+        batch_op.alter_column(
+            'img_data', existing_type=sa.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=True
+        )
+
+    # 分批把 base64 图片写入磁盘，img_data 只保留外部链接
+    # 需要在应用上下文里执行（flask db upgrade），图片目录来自 IMAGE_STORAGE
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                'SELECT id, img_data FROM question_images '
+                'WHERE id > :last_id AND img_hash IS NULL AND img_data IS NOT NULL '
+                'ORDER BY id LIMIT :limit'
+            ),
+            {'last_id': last_id, 'limit': BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+
+        for row in rows:
+            data = decode_image_data(row.img_data)
+            if data:
+                bind.execute(
+                    sa.text('UPDATE question_images SET img_hash = :img_hash, img_data = NULL WHERE id = :id'),
+                    {'img_hash': store_image(data), 'id': row.id},
+                )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # 图片文件保留在磁盘上，这里只把数据写回 base64
+    import base64
+    from myapp.image_store import image_path, sniff_mimetype
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text('SELECT id, img_hash FROM question_images WHERE img_hash IS NOT NULL')).all()
+    for row in rows:
+        with open(image_path(row.img_hash), 'rb') as f:
+            data = f.read()
+        bind.execute(
+            sa.text('UPDATE question_images SET img_data = :img_data WHERE id = :id'),
+            {'img_data': f'data:{sniff_mimetype(data[:16])};base64,{base64.b64encode(data).decode()}', 'id': row.id},
+        )
+
+    with op.batch_alter_table('question_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_images_img_hash')
+        batch_op.drop_column('img_hash')
@@ -0,0 +1,72 @@
+"""store sha256 digests of tokens instead of raw JWTs
+
+Revision ID: c7d35e9f0b41
+Revises: 8b4e2d6f1a23
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d35e9f0b41'
+down_revision = '8b4e2d6f1a23'
+branch_labels = None
+depends_on = None
+
+TABLES = ['token', 'reset_password_token', 'activation_token']
+BATCH_SIZE = 1000
+
+
+def backfill(table_name: str) -> None:
+    bind = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column('id', sa.Integer),
+        sa.column('token', sa.String),
+        sa.column('token_hash', sa.BINARY),
+    )
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.token).where(table.c.token_hash.is_(None)).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')).values(token_hash=sa.bindparam('digest')),
+            [{'row_id': row.id, 'digest': hashlib.sha256(row.token.encode('utf-8')).digest()} for row in rows],
+        )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table_name in TABLES:
+        columns = [column['name'] for column in inspector.get_columns(table_name)]
+        # create_app() 会先执行 db.create_all()，新建的库里已经是摘要列
+        if 'token' not in columns:
+            continue
+
+        if 'token_hash' not in columns:
+            with op.batch_alter_table(table_name, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('token_hash', sa.BINARY(32), nullable=True))
+
+        backfill(table_name)
+
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column('token_hash', existing_type=sa.BINARY(32), nullable=False)
+            batch_op.create_unique_constraint('token_hash', ['token_hash'])
+            batch_op.drop_column('token')
+
+
+def downgrade():
+    # 原始 token 无法从摘要还原，降级后所有用户需要重新登录
+    for table_name in TABLES:
+        op.execute(sa.text(f'DELETE FROM {table_name}'))
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_constraint('token_hash', type_='unique')
+            batch_op.drop_column('token_hash')
+            batch_op.add_column(sa.Column('token', sa.String(256), nullable=False))
+            batch_op.create_unique_constraint('token', ['token'])
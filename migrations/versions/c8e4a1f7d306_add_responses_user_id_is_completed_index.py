@@ -0,0 +1,29 @@
+"""add (user_id, is_completed) index to responses
+
+Revision ID: c8e4a1f7d306
+Revises: a6d2f8c4e951
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a1f7d306'
+down_revision = 'a6d2f8c4e951'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里索引已经存在
+    indexes = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('responses')]
+    if 'ix_responses_user_id_is_completed' not in indexes:
+        op.create_index(
+            'ix_responses_user_id_is_completed', 'responses', ['user_id', 'is_completed'], unique=False
+        )
+
+
+def downgrade():
+    op.drop_index('ix_responses_user_id_is_completed', table_name='responses')
@@ -0,0 +1,34 @@
+"""add question_images thumb_hash, original_size, stored_size
+
+Revision ID: d1f4a8b2c6e3
+Revises: b3e7c1d9f284
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f4a8b2c6e3'
+down_revision = 'b3e7c1d9f284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('question_images')]
+    with op.batch_alter_table('question_images', schema=None) as batch_op:
+        if 'thumb_hash' not in columns:
+            batch_op.add_column(sa.Column('thumb_hash', sa.String(length=64), nullable=True))
+        if 'original_size' not in columns:
+            batch_op.add_column(sa.Column('original_size', sa.Integer(), nullable=True))
+        if 'stored_size' not in columns:
+            batch_op.add_column(sa.Column('stored_size', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('question_images', schema=None) as batch_op:
+        batch_op.drop_column('stored_size')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('thumb_hash')
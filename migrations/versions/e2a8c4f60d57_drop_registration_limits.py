@@ -0,0 +1,31 @@
+"""drop registration_limits, replaced by the SQLite rate limiter
+
+Revision ID: e2a8c4f60d57
+Revises: c7d35e9f0b41
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8c4f60d57'
+down_revision = 'c7d35e9f0b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'registration_limits' in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table('registration_limits')
+
+
+def downgrade():
+    op.create_table(
+        'registration_limits',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ip', sa.String(length=45), nullable=False),
+        sa.Column('register_time', sa.DateTime(), server_default=sa.text('(utc_timestamp())'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
@@ -0,0 +1,29 @@
+"""add (is_completed, create_time) index to responses
+
+Revision ID: e7b3d5a9c482
+Revises: c8e4a1f7d306
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d5a9c482'
+down_revision = 'c8e4a1f7d306'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() 会先执行 db.create_all()，新建的库里索引已经存在
+    indexes = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('responses')]
+    if 'ix_responses_is_completed_create_time' not in indexes:
+        op.create_index(
+            'ix_responses_is_completed_create_time', 'responses', ['is_completed', 'create_time'], unique=False
+        )
+
+
+def downgrade():
+    op.drop_index('ix_responses_is_completed_create_time', table_name='responses')
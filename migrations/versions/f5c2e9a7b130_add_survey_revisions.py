@@ -0,0 +1,51 @@
+"""add survey_revisions, survey_slot.revision_id and responses.revision_id
+
+Revision ID: f5c2e9a7b130
+Revises: d1f4a8b2c6e3
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c2e9a7b130'
+down_revision = 'd1f4a8b2c6e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有的插槽不在这里冻结，第一次有人开始答题时补充冻结；已有的答卷保持为空，按问卷当前的内容显示
+    inspector = sa.inspect(op.get_bind())
+    if 'survey_revisions' not in inspector.get_table_names():
+        op.create_table(
+            'survey_revisions',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('survey_id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=False),
+            sa.Column('create_time', sa.DateTime(), server_default=sa.text('(utc_timestamp())'), nullable=True),
+            sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('survey_id', 'version', name='uq_survey_revisions_survey_id_version'),
+        )
+
+    for table in ('survey_slot', 'responses'):
+        columns = [column['name'] for column in inspector.get_columns(table)]
+        if 'revision_id' not in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('revision_id', sa.Integer(), nullable=True))
+                batch_op.create_foreign_key(
+                    f'fk_{table}_revision_id', 'survey_revisions', ['revision_id'], ['id']
+                )
+
+
+def downgrade():
+    for table in ('responses', 'survey_slot'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_revision_id', type_='foreignkey')
+            batch_op.drop_column('revision_id')
+    op.drop_table('survey_revisions')
@@ -1,5 +1,4 @@
 import os
-from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 from flask import Flask, Request, jsonify
@@ -9,6 +8,7 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 login_manager: LoginManager = LoginManager()
 db: SQLAlchemy = SQLAlchemy()
@@ -35,13 +35,18 @@ def create_app():
     login_manager.init_app(app)
     db.init_app(app)
 
-    from myapp.db_model import Token
+    from myapp.db_model import hash_token
+    from myapp.token_cache import resolve_jwt, resolve_token
     with app.app_context():
         db.create_all()
 
     from .config import Config
     my_config = Config(app, db)
 
+    # 反向代理后面运行时，客户端 IP 取代理追加到 X-Forwarded-For 的值
+    if app.config["PROXY_COUNT"] > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_COUNT"])  # type: ignore
+
     cors.init_app(
         app=app,
         resources={
@@ -74,10 +79,34 @@ def create_app():
     app.register_blueprint(survey, url_prefix="/survey")
     app.register_blueprint(guarantee, url_prefix="/guarantee")
 
+    # 维护任务：命令行清理和可选的后台定时清理
+    from myapp.maintenance import expire_responses_command, purge_tokens_command, start_scheduler
+    app.cli.add_command(purge_tokens_command)
+    app.cli.add_command(expire_responses_command)
+    start_scheduler(app)
+
+    # 按 Accept-Encoding 压缩较大的 JSON 响应
+    from myapp.compress import compress_response
+    app.after_request(compress_response)
+
     @app.route("/")
     def hello():
         return "Hello world!\nHello Flask!"
 
+    # 密码哈希进程池排队已满
+    from myapp.hashing import PasswordHashOverload
+
+    @app.errorhandler(PasswordHashOverload)
+    def password_hash_overload(e):
+        return jsonify({"code": 5, "desc": "服务器繁忙，请稍后再试!"}), 503
+
+    # 分页游标无法解析
+    from myapp.pagination import InvalidCursor
+
+    @app.errorhandler(InvalidCursor)
+    def invalid_cursor(e):
+        return jsonify({"code": 1, "desc": "分页参数错误"}), 400
+
     # 未授权的用户重定向到登录页面
     @login_manager.unauthorized_handler
     def unauthorized():
@@ -85,20 +114,17 @@ def create_app():
 
     # 管理登录状态的，这个函数是在每次请求时被调用的，它需要从用户 ID 重新创建一个 User 对象
     # 这是因为 User 对象并不会在请求之间保持，所以我们需要在每次请求开始时重新创建它
-    # 使用 request_loader 自定义加载逻辑
+    # 使用 request_loader 自定义加载逻辑，token 对应的用户快照缓存在进程内，命中时不查询数据库
     @login_manager.request_loader
     def load_user_from_request(request: Request):
         # 尝试从查询参数中获取 token
         token: str | None = request.headers.get("Authorization")
         if token and token.startswith("Bearer "):
             token = token.replace("Bearer ", "", 1)  # 假设使用 Bearer 认证
-            token_record: Token | None = Token.query.filter_by(token=token).first()
-            if (
-                token_record
-                and not token_record.is_revoked
-                and token_record.expires_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
-            ):
-                return token_record.user
+            token_hash = hash_token(token)  # 数据库和缓存里都只保存 token 的摘要
+            if app.config["JWT_STATELESS"]:
+                return resolve_jwt(token, token_hash)
+            return resolve_token(token_hash)
         # 如果两种方式都未找到用户，返回 None
         return None
 
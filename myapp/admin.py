@@ -1,6 +1,9 @@
-from datetime import datetime, timezone
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
+from sqlalchemy import case, exists, func, select
+from sqlalchemy.orm import aliased
 
 from myapp import db, my_config, APP
 from myapp.db_model import (
@@ -11,14 +14,27 @@ from myapp.db_model import (
     QuestionImgURL,
     SurveySlot,
     Response,
-    ResponseDetail,
     ResponseScore,
     Survey,
     User,
     Whitelist,
 )
+from myapp.answers import load_answers
+from myapp.image_pipeline import IngestedImage, ingest_images
+from myapp.image_store import image_json, image_record
+from myapp.lockout import login_lockout
+from myapp.revision import freeze_revision, load_revision
 from myapp.mail import survey_result_mail, send_mail
-from myapp.utils import check_password, required_role, is_survey_response_expired, validate_json_required_fields
+from myapp.pagination import paginate
+from myapp.survey_loader import build_survey_content, load_questions
+from myapp.token_cache import evict_user, revoke_user_tokens
+from myapp.utils import (
+    check_password,
+    required_role,
+    response_expire_cutoff,
+    response_expired,
+    validate_json_required_fields,
+)
 
 admin = Blueprint("admin", __name__)
 
@@ -56,6 +72,40 @@ def delete_config():
     return jsonify({"code": 1, "desc": "该配置项不存在"})
 
 
+@admin.route("/loginLockout", methods=["GET"])
+@login_required
+@required_role("admin")
+def get_login_lockout():
+    """
+    查看当前进程内的登录失败计数，多个 worker 各自独立统计
+    """
+    now = datetime.now(timezone.utc).timestamp()
+    result = [
+        {
+            "key": key,
+            "failures": record.failures,
+            "locked": record.locked_until > now,
+            "lockedUntil": datetime.fromtimestamp(record.locked_until, timezone.utc) if record.locked_until else None,
+            "lastFailure": datetime.fromtimestamp(record.last_failure, timezone.utc),
+        }
+        for key, record in login_lockout.snapshot()
+    ]
+    return jsonify({"code": 0, "desc": "获取成功", "list": result})
+
+
+@admin.route("/loginLockout", methods=["DELETE"])
+@login_required
+@required_role("admin")
+def clear_login_lockout():
+    req_data = request.json
+    if not req_data or not req_data.get("key"):
+        return jsonify({"code": 1, "desc": "缺少 key！"})
+
+    if login_lockout.reset(req_data["key"]):
+        return jsonify({"code": 0, "desc": "解除锁定成功"})
+    return jsonify({"code": 1, "desc": "该记录不存在"})
+
+
 def is_survey_mounted(survey_id: int) -> bool:
     res = SurveySlot.query.filter_by(mounted_survey_id=survey_id).count()
     return True if res else False
@@ -121,6 +171,7 @@ def mod_survey():
 
             survey.name = name
             survey.description = description
+            Survey.bump_version(survey.id)
 
             db.session.commit()
             return jsonify({"code": 0, "desc": "成功"})
@@ -202,9 +253,24 @@ def check_and_format_questions(questions: list)->dict:
     return {"success": True, "data": return_data}
 
 
-def add_question_images(question_id: int, img_list: list) -> None:
+def add_question_images(question_id: int, img_list: list, ingested: Iterator[IngestedImage] | None = None) -> None:
+    """
+    :param ingested: 已经处理好的图片，按 img_list 的顺序依次取用，为空时在这里处理
+    """
+    if ingested is None:
+        ingested = iter(ingest_images([item["data"] for item in img_list]))
+
     for item in img_list:
-        img: QuestionImgURL = QuestionImgURL(question_id=question_id, img_alt=item["alt"], img_data=item["data"])
+        image = next(ingested)
+        img: QuestionImgURL = QuestionImgURL(
+            question_id=question_id,
+            img_alt=item["alt"],
+            img_data=image.img_data,
+            img_hash=image.img_hash,
+            thumb_hash=image.thumb_hash,
+            original_size=image.original_size,
+            stored_size=image.stored_size,
+        )
         db.session.add(img)
 
 
@@ -238,7 +304,14 @@ def add_question():
     if formatted_data["success"] is False:
         return jsonify({"code": 1, "desc": formatted_data["desc"]})
 
+    # 整个请求里的图片一次性交给进程池并行处理
+    ingested = iter(ingest_images(
+        [item["data"] for question_data in formatted_data["data"] for item in question_data["images"]]
+    ))
+
+    survey_ids = set()
     for question_data in formatted_data["data"]:
+        survey_ids.add(question_data["survey_id"])
         if question_data["display_order"] == 0:
             question: Question = Question.append_question(
                 survey_id=question_data["survey_id"],
@@ -256,8 +329,9 @@ def add_question():
             )
 
         add_question_options(question.id, question.question_type, question_data["options"])
-        add_question_images(question.id, question_data["images"])
+        add_question_images(question.id, question_data["images"], ingested)
 
+    Survey.bump_version(*survey_ids)
     db.session.commit()
     return jsonify({"code": 0, "desc": "添加题目成功"})
 
@@ -291,7 +365,9 @@ def migration_question():
         .first()
     )
     current_question.display_order = 1 if max_display_order is None else max_display_order.display_order + 1 # pyright: ignore
+    source_survey_id = current_question.survey_id
     current_question.survey_id = target_survey_id
+    Survey.bump_version(source_survey_id, target_survey_id)
     db.session.commit()
     return jsonify({"code": 0, "desc": "迁移题目成功"})
 
@@ -316,6 +392,7 @@ def edit_question():
         return jsonify({"code": 1, "desc": "题目不存在"})
 
     # 更新题目基本信息
+    source_survey_id = question.survey_id
     question.survey_id = req_data["surveyId"]
     question.question_text = req_data["title"]
     question.question_type = req_data["type"]
@@ -326,11 +403,14 @@ def edit_question():
     Option.query.filter_by(question_id=question_id).delete()
     add_question_options(question.id, question.question_type, options)
 
-    # 处理图片数据
+    # 处理图片数据，先处理再删除旧记录，沿用已有图片的缩略图和大小
     img_list = req_data.get("img_list", [])
+    ingested = iter(ingest_images([item["data"] for item in img_list]))
     QuestionImgURL.query.filter_by(question_id=question_id).delete()
-    add_question_images(question_id, img_list)
+    add_question_images(question_id, img_list, ingested)
 
+    # 题目修改完之后再重新计算满分
+    Survey.bump_version(source_survey_id, question.survey_id)
     db.session.commit()
 
     return jsonify({"code": 0, "desc": "修改题目成功"})
@@ -356,6 +436,7 @@ def del_question():
 
         # 保险起见，把排序设置为0
         question.display_order = 0
+        Survey.bump_version(question.survey_id)
 
         # 提交事务
         db.session.commit()
@@ -382,6 +463,7 @@ def sort_survey_question():
 
     origin_order_set = set()
     new_order_set = set()
+    survey_ids = set()
 
     for i in order_list:
         question : None | Question = Question.query.get(i["id"])
@@ -389,12 +471,14 @@ def sort_survey_question():
                 return jsonify({"code": 1, "desc": "不存在ID为{i.id}的题目"})
         origin_order_set.add(question.display_order)
         new_order_set.add(i["display_order"])
+        survey_ids.add(question.survey_id)
         question.display_order = i["display_order"]
 
     # 保险起见
     if origin_order_set != new_order_set:
         return jsonify({"code": 1, "desc": "数据错误"})
 
+    Survey.bump_version(*survey_ids)
     db.session.commit()
     return jsonify({"code": 0, "desc": "排序成功"})
 
@@ -403,11 +487,8 @@ def sort_survey_question():
 @login_required
 @required_role("admin")
 def whitelist():
-    page = request.args.get("page", 1, type=int)  # 获取页码，默认为 1
-    per_page = request.args.get("size", 10, type=int)  # 获取每页条数，默认为 10
-
     # 分页查询白名单
-    pagination = Whitelist.query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = paginate(Whitelist.query, ("whitelist",), Whitelist.id)
     result = pagination.items
 
     # 构造返回数据
@@ -431,9 +512,7 @@ def whitelist():
         })
 
     # 添加分页信息
-    response_data["page"] = pagination.page
-    response_data["size"] = pagination.per_page
-    response_data["total"] = pagination.total
+    response_data.update(pagination.meta())
 
     return jsonify(response_data)
 
@@ -442,12 +521,9 @@ def whitelist():
 @login_required
 @required_role("admin")
 def users():
-    page = request.args.get("page", 1, type=int)  # 获取页码，默认为 1
-    per_page = request.args.get("size", 10, type=int)  # 获取每页条数，默认为 10
-
     # 分页查询用户
     query = User.query.filter(User.status != 4)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = paginate(query, ("users",), User.id)
     users = pagination.items
 
     # 构造返回数据
@@ -470,9 +546,7 @@ def users():
             "code": 0,
             "desc": "success",
             "list": user_data,
-            "page": pagination.page,
-            "size": pagination.per_page,
-            "total": pagination.total,
+            **pagination.meta(),
         }
     )
 
@@ -560,6 +634,7 @@ def set_user():
 
         if password is not None and check_password(password):
             user.set_password(password)
+            revoke_user_tokens(user)
 
         if user_qq:
             user.user_qq = user_qq
@@ -569,19 +644,22 @@ def set_user():
             dt = datetime.fromisoformat(iso_string_fixed)
             user.addtime = dt
 
-        if role:
+        # 角色或状态变化后，无状态模式下 token 里携带的旧值需要作废
+        if role and role != user.role:
             user.role = role
+            revoke_user_tokens(user)
 
-        if status is not None:
+        if status is not None and status != user.status:
             user.status = status
+            revoke_user_tokens(user)
 
             # 如果用户被封禁、临时封禁、删除，则删除名下白名单，如果之后被解封，需要重新考取白名单资格，系统不会自动恢复
             if status in (2, 3, 4):
-                wl = user.whitelist
-                for item in wl:
-                    db.session.delete(item)
+                Whitelist.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+                user.play_permission = False
 
         db.session.commit()
+        evict_user(user.id, user.tokens_valid_after)
         return jsonify({"code": 0, "desc": "用户信息更新成功！"})
     return jsonify({"code": 1, "desc": "缺少信息"}), 400
 
@@ -605,7 +683,9 @@ def del_user():
 
         # 逻辑删除用户
         user.status = 4
+        revoke_user_tokens(user)
         db.session.commit()
+        evict_user(user.id, user.tokens_valid_after)
 
         return jsonify({"code": 0, "desc": "用户删除成功！"})
     return jsonify({"code": 1, "desc": "缺少信息"})
@@ -615,94 +695,166 @@ def del_user():
 @login_required
 @required_role("admin")
 def get_surveys():
-    result = Survey.query.all()
+    # 每个问卷的答卷计数在一条分组查询里算出，挂载状态用 EXISTS 子查询，问卷再多也只查询一次
+    # 过期但还没被定时任务标记的答卷不算作答中，按已完成（已拒绝）统计
+    cutoff = response_expire_cutoff()
+    in_progress = (Response.is_completed == False) & (Response.create_time >= cutoff)
+    counts = (
+        db.session.query(
+            Response.survey_id,
+            func.count().label("total"),
+            func.sum(case((in_progress, 1), else_=0)).label("not_completed"),
+            func.sum(case(((Response.is_completed == True) & (Response.is_reviewed == 0), 1), else_=0)).label(
+                "not_reviewed"
+            ),
+        )
+        .group_by(Response.survey_id)
+        .subquery()
+    )
+    mounted = exists().where(SurveySlot.mounted_survey_id == Survey.id)
+    result = (
+        db.session.query(
+            Survey.id,
+            Survey.name,
+            Survey.description,
+            Survey.create_time,
+            mounted.label("mounted"),
+            func.coalesce(counts.c.total, 0).label("total"),
+            func.coalesce(counts.c.not_completed, 0).label("not_completed"),
+            func.coalesce(counts.c.not_reviewed, 0).label("not_reviewed"),
+        )
+        .outerjoin(counts, counts.c.survey_id == Survey.id)
+        .order_by(Survey.id)
+        .all()
+    )
+
     response_data = {"code": 0, "desc": "yes", "list": []}
     for _survey in result:
-        not_completed_count: int = 0
-        survey_response_list = Response.query.filter_by(id=_survey.id).all()
-
-        for i in survey_response_list:
-            expired = is_survey_response_expired(i)
-            if expired is False and i.is_completed is False:
-                not_completed_count += 1
-
-        not_reviewed_count = Response.query.filter(
-            Response.survey_id == _survey.id,
-            Response.is_reviewed == 0
-        ).count()
-
-        m = is_survey_mounted(_survey.id)
-        status = 1 if m else 0
-
         response_data["list"].append(
             {
                 "id": _survey.id,
                 "name": _survey.name,
                 "description": _survey.description,
                 "createTime": _survey.create_time,
-                "status": status,
-                "notCompletedCount": not_completed_count,
-                "notReviewedCount": not_reviewed_count,
+                "status": 1 if _survey.mounted else 0,
+                "notCompletedCount": int(_survey.not_completed),
+                "notReviewedCount": int(_survey.not_reviewed),
+                "completedCount": int(_survey.total - _survey.not_completed),
             }
         )
     return jsonify(response_data)
 
 
+def utc_naive(value: datetime) -> datetime:
+    """
+    数据库里的时间是不带时区的 UTC 时间，带时区的参数先转换过去
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# 答卷列表允许的排序字段，都有索引（InnoDB 的二级索引自带主键，游标按 (排序字段, id) 定位）
+RESPONSE_SORT_COLUMNS = {
+    "id": Response.id,
+    "createTime": Response.create_time,
+}
+
+
 @admin.route("/responses", methods=["GET"])
 @login_required
 @required_role("admin")
 def get_responses():
     """
     查询答卷列表
+    可选参数：surveyId 问卷，reviewed 阅卷状态，start / end 创建时间范围（UTC，ISO 格式，只有日期时包含 end 当天），
+    sort 排序字段（id 或 createTime），order 排序方向（asc 或 desc），after 游标（见 pagination.paginate）
     """
-    page = request.args.get("page", 1, type=int)  # 获取页码，默认为 1
-    per_page = request.args.get("size", 10, type=int)  # 获取每页条数，默认为 10
+    sort = request.args.get("sort", "id")
+    survey_id = request.args.get("surveyId", type=int)
+    reviewed = request.args.get("reviewed", type=int)
+    sort_column = RESPONSE_SORT_COLUMNS.get(sort)
+    order = request.args.get("order", "asc")
+    if sort_column is None or order not in ("asc", "desc"):
+        return jsonify({"code": 1, "desc": "排序参数错误"}), 400
 
-    pagination = Response.query.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        start = request.args.get("start")
+        start_time = utc_naive(datetime.fromisoformat(start)) if start else None
+        end = request.args.get("end")
+        end_time = utc_naive(datetime.fromisoformat(end)) if end else None
+        if end and len(end) == 10:
+            end_time += timedelta(days=1)
+    except ValueError:
+        return jsonify({"code": 1, "desc": "时间格式错误"}), 400
+
+    # 用户名、问卷名、阅卷人和得分在一条查询里取出，得分只对当前页的答卷逐行聚合
+    reviewer = aliased(User)
+    earned_score = (
+        select(func.coalesce(func.sum(ResponseScore.score), 0))
+        .where(ResponseScore.response_id == Response.id)
+        .scalar_subquery()
+    )
+    query = (
+        db.session.query(
+            Response.id,
+            Response.is_completed,
+            Response.is_reviewed,
+            Response.player_name,
+            Response.create_time,
+            Response.response_time,
+            Response.survey_id,
+            User.username,
+            Survey.name.label("survey_name"),
+            reviewer.username.label("reviewer_name"),
+            func.coalesce(Response.archive_score, earned_score).label("score"),
+        )
+        .join(User, User.id == Response.user_id)
+        .join(Survey, Survey.id == Response.survey_id)
+        .outerjoin(reviewer, reviewer.id == Response.reviewer_uid)
+    )
+
+    # 过期但还没被定时任务标记的答卷按已拒绝显示，筛选时也按已拒绝处理
+    cutoff = response_expire_cutoff()
+    expired = (Response.is_completed == False) & (Response.create_time < cutoff)
+    if survey_id is not None:
+        query = query.filter(Response.survey_id == survey_id)
+    if reviewed is not None:
+        if reviewed == 2:
+            query = query.filter((Response.is_reviewed == 2) | expired)
+        else:
+            query = query.filter(Response.is_reviewed == reviewed, ~expired)
+    if start_time is not None:
+        query = query.filter(Response.create_time >= start_time)
+    if end_time is not None:
+        query = query.filter(Response.create_time < end_time)
+
+    # 总数的缓存 key 包含所有筛选条件
+    count_key = ("responses", survey_id, reviewed, start_time, end_time)
+    pagination = paginate(query, count_key, Response.id, sort_column, descending=order == "desc")
     result = pagination.items
 
     response_data = {
         "code": 0,
         "desc": "yes",
         "list": [],
-        "page": pagination.page,
-        "size": pagination.per_page,
-        "total": pagination.total,
+        **pagination.meta(),
     }
     for i in result:
-        # 刷新一下是否过期
-        is_survey_response_expired(i)
-
-        total_score: float = 0
-
-        # 如果是被批改完的卷子，就直接调取总分，否则计算一遍
-        if i.archive_score is None:
-            scores = ResponseScore.query.filter_by(response_id=i.id).all()
-            total_score = sum(score.score for score in scores)  # 计算总分
-
-        else:
-            total_score = i.archive_score
-
-        reviewer: None | User = User.query.get(i.reviewer_uid)
-
-        if reviewer is None:
-            reviewer_name = "该用户不存在"
-        else:
-            reviewer_name = reviewer.username
-
+        is_expired = response_expired(i.is_completed, i.create_time, cutoff)
         response_data["list"].append(
             {
                 "id": i.id,
-                "isCompleted": i.is_completed,
-                "isReviewed": i.is_reviewed,
-                "username": i.user.username,
+                "isCompleted": i.is_completed or is_expired,
+                "isReviewed": 2 if is_expired else i.is_reviewed,
+                "username": i.username,
                 "playername": i.player_name,
-                "survey": i.survey_res.name,
-                "score": total_score,
-                "surveyId": i.survey_res.id,
+                "survey": i.survey_name,
+                "score": i.score,
+                "surveyId": i.survey_id,
                 "createTime": i.create_time,
                 "responseTime": i.response_time,
-                "reviewer_name": reviewer_name,
+                "reviewer_name": "该用户不存在" if i.reviewer_name is None else i.reviewer_name,
             }
         )
     return jsonify(response_data)
@@ -726,12 +878,8 @@ def get_survey(sid: int):
         "questions": [],
     }
 
-    # 查询问卷中的所有题目
-    for question in survey.questions:
-        # 不返回被逻辑删除的题目
-        if question.logical_deletion:
-            continue
-
+    # 查询问卷中的所有题目，被逻辑删除的题目已经在 SQL 里过滤掉
+    for question in load_questions(survey.id):
         question_data = {
             "display_order" : question.display_order,
             "id": question.id,
@@ -743,7 +891,7 @@ def get_survey(sid: int):
         }
 
         for img in question.img_list:
-            question_data["img_list"].append({"id": img.id, "alt": img.img_alt, "data": img.img_data})
+            question_data["img_list"].append({"id": img.id, **image_json(image_record(img))})
 
         # 查询题目中的所有选项
         for option in question.options:
@@ -780,6 +928,10 @@ def reviewed_response():
         if resp.is_reviewed:
             return jsonify({"code": 1, "desc": "已被审核! "})
 
+        # 超时未提交的答卷视为已拒绝，不能再审核通过
+        if response_expired(resp.is_completed, resp.create_time):
+            return jsonify({"code": 1, "desc": "答卷已过期! "})
+
         if status not in [0, 1, 2]:
             return jsonify({"code": 4, "desc": "未知状态！"})
 
@@ -807,6 +959,7 @@ def reviewed_response():
                     source=0,
                     auditor_uid=current_user.id
             ))
+            User.refresh_play_permission(resp.user_id)
 
         send_mail(APP, survey_result_mail([f'{resp.user.user_qq}@qq.com'], str(total_score)))
 
@@ -832,68 +985,78 @@ def get_detail(resp_id: int):
     if not survey:
         return jsonify({"code": 1, "desc": "未找到问卷"}), 404
 
+    # 显示用户作答时看到的问卷版本，旧答卷没有记录版本，使用问卷当前的内容（包括被逻辑删除的题目）
+    content: dict | None = None
+    if res.revision_id is not None:
+        content = load_revision(res.revision_id)
+    if content is None:
+        content = build_survey_content(survey, include_deleted=True)
+
     survey_data = {
         "id": res.id,
-        "name": survey.name,
-        "description": survey.description,
+        "name": content["name"],
+        "description": content["description"],
         "create_time": survey.create_time,
-        "isReviewed": res.is_reviewed,
+        "isReviewed": 2 if response_expired(res.is_completed, res.create_time) else res.is_reviewed,
         # "status": survey.status, 好像用不到
         "questions": [],
     }
 
-    # 查询问卷中的所有题目
-    for question in survey.questions:
-        response_score: ResponseScore | None = ResponseScore.query.filter_by(
-            question_id=question.id, response_id=resp_id
-        ).first()
+    # 一次取出整份答卷的答案和每道题的得分，同一道题有多行得分时取最早的一行
+    answers: dict[int, list[str]] = load_answers(resp_id)
+    scores: dict[int, float] = {}
+    score_rows = (
+        db.session.query(ResponseScore.question_id, ResponseScore.score)
+        .filter(ResponseScore.response_id == resp_id)
+        .order_by(ResponseScore.id)
+        .all()
+    )
+    for row in score_rows:
+        scores.setdefault(row.question_id, row.score)
 
-        # 查询题目中的所有选项详情
-        details: list[ResponseDetail] = ResponseDetail.query.filter_by(
-            question_id=question.id, response_id=resp_id
-        ).all()
+    for question in content["questions"]:
+        # 这道题的答案，选择题是选项 ID，填空、简答题是答案文本
+        details: list[str] = answers.get(question["id"], [])
 
         # 如果题目被逻辑删除，并且用户未作答，则不显示
-        if question.logical_deletion and len(details) == 0:
+        if question["deleted"] and len(details) == 0:
             continue
 
-        score = 0
+        score = scores.get(question["id"], 0)
         user_selected_option: list[int] = []
 
-        if response_score is not None:
-            score = response_score.score
-
         question_data = {
-            "display_order": question.display_order,
-            "id": question.id,
-            "title": question.question_text,
-            "type": question.question_type,
-            "score": question.score,
+            "display_order": question["display_order"],
+            "id": question["id"],
+            "title": question["title"],
+            "type": question["type"],
+            "score": question["score"],
             "userGetScore": score,
             "options": [],
-            "img_list": [],
+            "img_list": [image_json(img) for img in question["img_list"]],
             "text_answer": "",
         }
 
-        for img in question.img_list:
-            question_data["img_list"].append({"alt": img.img_alt, "data": img.img_data})
-
         # 标注用户选择的选项
         if (
-            question.question_type == QuestionCategory.SINGLE_CHOICE.value
-            or question.question_type == QuestionCategory.MULTIPLE_CHOICE.value
+            question["type"] == QuestionCategory.SINGLE_CHOICE.value
+            or question["type"] == QuestionCategory.MULTIPLE_CHOICE.value
         ):
+            # 旧版本可能保存过不是选项 ID 的答案，跳过即可
             for detail in details:
-                user_selected_option.append(int(detail.answer))
+                try:
+                    user_selected_option.append(int(detail))
+                except ValueError:
+                    continue
 
-        for option in question.options:
+        for option in question["options"]:
             question_data["options"].append(
                 {
-                    "id": option.id,
-                    "text": option.option_text,
-                    "isCorrect": option.is_correct,
-                    "isSelected": True if option.id in user_selected_option else False,
-                    "inputText": details[0].answer if question.question_type in [3, 4] and len(details) != 0 else "",
+                    "id": option["id"],
+                    "text": option["text"],
+                    "isCorrect": option["is_correct"],
+                    "isSelected": True if option["id"] in user_selected_option else False,
+                    "inputText": details[0] if question["type"] in [3, 4] and len(details) != 0 else "",
                 }
             )
 
@@ -940,7 +1103,9 @@ def add_slot():
     if mounted_survey is None:
         return jsonify({"code": 1, "desc": "挂载的问卷不存在"})
 
-    slot: SurveySlot = SurveySlot(slot_name=slot_name, survey_id=mounted_survey_id)
+    # 挂载时冻结问卷当前的内容，之后的修改不影响这个插槽
+    revision = freeze_revision(mounted_survey_id)
+    slot: SurveySlot = SurveySlot(slot_name=slot_name, survey_id=mounted_survey_id, revision_id=revision.id)
 
     db.session.add(slot)
     db.session.commit()
@@ -966,7 +1131,9 @@ def set_slot():
             new_mounted_survey: Survey | None = Survey.query.get(new_survey_id)
 
             if new_mounted_survey:
+                # 重新挂载同一个问卷也会冻结最新的内容，修改问卷后用这种方式发布
                 slot.mounted_survey_id = new_survey_id
+                slot.revision_id = freeze_revision(new_survey_id).id
                 db.session.commit()
 
                 return jsonify({"code": 0, "desc": f"修改{slot.slot_name}插槽成功"})
@@ -1008,10 +1175,7 @@ def del_slot():
 @login_required
 @required_role("admin")
 def get_guarantee():
-    page = request.args.get("page", 1, type=int)  # 获取页码，默认为 1
-    per_page = request.args.get("size", 10, type=int)  # 获取每页条数，默认为 10
-
-    pagination = Guarantee.query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = paginate(Guarantee.query, ("guarantee",), Guarantee.id)
 
     result_list = []
 
@@ -1029,9 +1193,7 @@ def get_guarantee():
         "code": 0,
         "desc": "yes",
         "list": result_list,
-        "page": pagination.page,
-        "size": pagination.per_page,
-        "total": pagination.total,
+        **pagination.meta(),
     }
     return jsonify(response_data)
 
@@ -0,0 +1,102 @@
+import unicodedata
+from typing import NamedTuple
+
+from myapp import db
+from myapp.cache import TTLCache
+from myapp.db_model import QuestionCategory, Survey
+from myapp.revision import load_revision
+from myapp.survey_loader import build_survey_content
+
+
+class QuestionKey(NamedTuple):
+    type: int
+    score: float
+    correct: frozenset[int]  # 正确选项的 ID
+    blank: str | None  # 填空题规范化之后的正确答案
+
+
+# ("revision", revision_id) 或 ("version", survey_id, version) -> {question_id: QuestionKey}
+answer_key_cache: TTLCache = TTLCache(maxsize=128)
+
+
+def normalize_blank(text: str) -> str:
+    """
+    填空题答案比较前先做 NFKC 规范化（全角字符转半角）并去掉首尾空白
+    """
+    return unicodedata.normalize("NFKC", text).strip()
+
+
+def compile_answer_key(questions: list[dict]) -> dict[int, QuestionKey]:
+    """
+    :param questions: 问卷内容里的题目，格式见 survey_loader.question_record
+    """
+    answer_key = {}
+    for question in questions:
+        correct_options = [option for option in question["options"] if option["is_correct"]]
+        blank = None
+        if question["type"] == QuestionCategory.FILL_IN_THE_BLANKS.value and correct_options:
+            blank = normalize_blank(correct_options[0]["text"])
+        answer_key[question["id"]] = QuestionKey(
+            type=question["type"],
+            score=question["score"],
+            correct=frozenset(option["id"] for option in correct_options),
+            blank=blank,
+        )
+    return answer_key
+
+
+def revision_answer_key(revision_id: int) -> dict[int, QuestionKey] | None:
+    """
+    冻结的问卷版本不会变化，答案表编译一次之后一直有效
+    """
+    key = ("revision", revision_id)
+    answer_key = answer_key_cache.get(key)
+    if answer_key is None:
+        content = load_revision(revision_id)
+        if content is None:
+            return None
+        answer_key = compile_answer_key(content["questions"])
+        answer_key_cache.set(key, answer_key)
+    return answer_key
+
+
+def survey_answer_key(survey_id: int) -> dict[int, QuestionKey]:
+    """
+    没有记录问卷版本的旧答卷按题目当前的内容评分，包括被逻辑删除的题目
+    按 Survey.version 缓存，修改题目后自动失效
+    """
+    version: int | None = db.session.query(Survey.version).filter(Survey.id == survey_id).scalar()
+    if version is None:
+        return {}
+
+    key = ("version", survey_id, version)
+    answer_key = answer_key_cache.get(key)
+    if answer_key is None:
+        survey: Survey | None = db.session.get(Survey, survey_id)
+        if survey is None:
+            return {}
+        answer_key = compile_answer_key(build_survey_content(survey, include_deleted=True)["questions"])
+        answer_key_cache.set(key, answer_key)
+    return answer_key
+
+
+def score_answer(question: QuestionKey, user_response: list[str]) -> float:
+    """
+    客观题评分，主观题和无法识别的答案得 0 分
+    """
+    try:
+        if question.type == QuestionCategory.SINGLE_CHOICE.value:
+            if int(user_response[0]) in question.correct:
+                return question.score
+
+        elif question.type == QuestionCategory.MULTIPLE_CHOICE.value:
+            if frozenset(int(option) for option in user_response) == question.correct:
+                return question.score
+
+        elif question.type == QuestionCategory.FILL_IN_THE_BLANKS.value:
+            if question.blank is not None and normalize_blank(user_response[0]) == question.blank:
+                return question.score
+    except (ValueError, TypeError, IndexError):
+        pass
+
+    return 0
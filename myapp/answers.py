@@ -0,0 +1,71 @@
+import json
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import insert
+
+from myapp import db
+from myapp.db_model import QuestionCategory, ResponseAnswers, ResponseDetail
+
+
+def normalize_answers(user_response: list, question_type: int) -> list[str]:
+    """
+    多选题保存所有选项，其它题型只保存第一个答案
+    选择题的答案必须是选项 ID，有无法解析为整数的答案时整道题视为未作答，返回空列表
+    """
+    if question_type == QuestionCategory.MULTIPLE_CHOICE.value:
+        answers = [str(answer) for answer in user_response]
+    else:
+        answers = [str(answer) for answer in user_response[:1]]
+
+    if question_type in (QuestionCategory.SINGLE_CHOICE.value, QuestionCategory.MULTIPLE_CHOICE.value):
+        try:
+            return [str(int(answer)) for answer in answers]
+        except ValueError:
+            return []
+    return answers
+
+
+def save_answers(response_id: int, answers: dict[int, list[str]]) -> None:
+    """
+    保存一份答卷的全部答案，由调用方负责 commit
+    RESPONSE_PACKED_ANSWERS 开启时整份答卷只写一行 response_answers，否则每个答案写一行 response_details
+    """
+    if not answers:
+        return
+
+    if current_app.config["RESPONSE_PACKED_ANSWERS"]:
+        packed = json.dumps({str(qid): values for qid, values in answers.items()}, ensure_ascii=False)
+        db.session.execute(insert(ResponseAnswers.__table__).values(response_id=response_id, answers=packed))
+        return
+
+    rows = [
+        {"response_id": response_id, "question_id": qid, "answer": value}
+        for qid, values in answers.items()
+        for value in values
+    ]
+    if rows:
+        db.session.execute(insert(ResponseDetail.__table__).values(rows))
+
+
+def load_answers(response_id: int) -> dict[int, list[str]]:
+    """
+    读取一份答卷的全部答案，question_id -> 答案列表
+    优先读取打包的答案，没有时读取 response_details（旧数据或者关闭了打包）
+    """
+    packed: str | None = (
+        db.session.query(ResponseAnswers.answers).filter(ResponseAnswers.response_id == response_id).scalar()
+    )
+    if packed is not None:
+        return {int(qid): values for qid, values in json.loads(packed).items()}
+
+    answers: dict[int, list[str]] = defaultdict(list)
+    rows = (
+        db.session.query(ResponseDetail.question_id, ResponseDetail.answer)
+        .filter(ResponseDetail.response_id == response_id)
+        .order_by(ResponseDetail.id)
+        .all()
+    )
+    for row in rows:
+        answers[row.question_id].append(row.answer)
+    return dict(answers)
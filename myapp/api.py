@@ -41,6 +41,7 @@ def add_whitelist():
         source=2,
         auditor_uid=user.id
     ))
+    User.refresh_play_permission(user.id)
     db.session.commit()
     return jsonify({"code": 0, "desc": "成功"})
 
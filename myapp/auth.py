@@ -1,31 +1,47 @@
+import math
 from datetime import datetime, timezone, timedelta
 from typing import Optional
+from uuid import uuid4
+
 import jwt
 from flask import Blueprint, current_app, jsonify, request
 from flask_login import current_user, login_required, login_user
 
 from myapp import APP, db
-from myapp.db_model import Token, User, RegistrationLimit, ResetPasswordToken, ActivationToken
+from myapp.db_model import Token, User, ResetPasswordToken, ActivationToken, hash_token
+from myapp.lockout import login_lockout
 from myapp.mail import reset_password_mail, activation_mail, send_mail
-from myapp.utils import check_password
+from myapp.rate_limit import rate_limit
+from myapp.token_cache import TOKEN_LIFETIME, evict_token, evict_user, revoke_user_tokens
+from myapp.utils import check_password, get_client_ip
 
 auth = Blueprint("auth", __name__)
 
 
 @auth.route("/login", methods=["POST"])
+@rate_limit("RATE_LIMIT_LOGIN")
 def login():
     req_data: Optional[dict[str, str]] = request.json
     if req_data:
         username = req_data["username"]
         password = req_data["password"]
+
+        # 锁定期间直接拒绝，不查询用户也不计算 bcrypt
+        user_key = login_lockout.user_key(username)
+        ip_key = login_lockout.ip_key(get_client_ip())
+        remaining = login_lockout.remaining(user_key, ip_key)
+        if remaining > 0:
+            return jsonify({"code": 5, "desc": f"登录失败次数过多，请 {math.ceil(remaining)} 秒后再试!"}), 429
+
         user: User | None = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            login_lockout.reset(user_key)
+            if user.password_needs_rehash():
+                user.set_password(password)  # 由 create_token 一起提交
+
             login_user(user)
             token = create_token(user)
 
-            temp = current_user.whitelist
-            play_permission: bool = True if len(temp) > 0 else False
-
             return jsonify(
                 {
                     "code": 0,
@@ -33,10 +49,12 @@ def login():
                     "username": user.username,
                     "avatar": user.avatar,
                     "isAdmin": user.role == "admin",
-                    "play_permission": play_permission,
+                    "play_permission": user.play_permission,
                 }
             )
         else:
+            login_lockout.record_failure(user_key, current_app.config["LOGIN_LOCKOUT_THRESHOLD"])
+            login_lockout.record_failure(ip_key, current_app.config["LOGIN_LOCKOUT_IP_THRESHOLD"])
             return jsonify({"code": 1, "desc": "用户名或密码错误!"})
     return jsonify({"code": 1, "desc": "字段错误！"})
 
@@ -49,33 +67,20 @@ def logout():
         token: str | None = request.headers.get("Authorization")
         if token and token.startswith("Bearer "):
             token = token.replace("Bearer ", "", 1)
-        tk: Token | None = Token.query.filter_by(token=token).first()
-        if tk is None:
+        # 只标记吊销，过期后由清理任务删除，无状态模式需要据此构建吊销列表
+        if not revoke_token(token):
             return jsonify({"code": 4, "desc": "Token not found"})
-        db.session.delete(tk)
-        db.session.commit()
         return jsonify({"code": 0, "desc": "退出成功"})
     return jsonify({"code": 1, "desc": "error"})
 
 
 @auth.route("/register", methods=["POST"])
+@rate_limit("RATE_LIMIT_REGISTER")
 def register():
     req_data = request.json
     if not req_data:
         return jsonify({"code": 1, "desc": "请求数据错误"})
 
-    # 获取客户端IP
-    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-
-    if client_ip is None:
-        return jsonify({"code": 1, "desc": "无法获取用户IP"})
-
-    client_ip_split = client_ip.split(',')[0]
-
-    # 检查IP注册限制
-    if check_ip_registration_limit(client_ip_split):
-        return jsonify({"code": 5, "desc": "该IP注册次数过多，请稍后再试!"})
-
     username = req_data.get("username")
     user_qq = req_data.get("userQQ")
     password = req_data.get("password")
@@ -105,14 +110,10 @@ def register():
     # if Whitelist.query.filter_by(player_name=username).first():
     #     return jsonify({"code": 3, "desc": "用户名已存在!"})
 
-    # 创建用户
+    # 创建用户，哈希放在 try 外面，繁忙时交给全局的错误处理返回 503
+    user = User(username=username, user_qq=user_qq).set_password(password)
     try:
-        user = User(username=username, user_qq=user_qq).set_password(password)
         db.session.add(user)
-
-        # 记录IP注册信息
-        record_ip_registration(client_ip)
-
         db.session.commit()
 
         token = create_token(user)
@@ -133,17 +134,13 @@ def register():
 def check_login():
     if current_user.is_authenticated:
         # 用户已登录，返回用户信息
-
-        temp = current_user.whitelist
-        play_permission: bool = True if len(temp) > 0 else False
-
         return jsonify(
             {
                 "code": 0,
                 "username": current_user.username,
                 "avatar": current_user.avatar,
                 "isAdmin": current_user.role == "admin",
-                "play_permission": play_permission,
+                "play_permission": current_user.play_permission,
             }
         )
     else:
@@ -158,18 +155,8 @@ def check_login():
 
 
 @auth.route('/findPassword', methods=["POST"])
+@rate_limit("RATE_LIMIT_FIND_PASSWORD")
 def find_password():
-    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-
-    if client_ip is None:
-        return jsonify({"code": 1, "desc": "无法获取用户IP"})
-
-    client_ip_split = client_ip.split(',')[0]
-
-    # 检查IP注册限制
-    if check_ip_registration_limit(client_ip_split):
-        return jsonify({"code": 5, "desc": "该IP注册次数过多，请稍后再试!"})
-
     if request.json:
         username = request.json.get('username')
         qq = request.json.get('userQQ')
@@ -184,7 +171,7 @@ def find_password():
 
 @auth.route('/findPassword', methods=["PUT"])
 def find_password_set():
-    token = ResetPasswordToken.query.filter_by(token=request.args.get('token', '')).first()
+    token = ResetPasswordToken.query.filter_by(token_hash=hash_token(request.args.get('token', ''))).first()
     if not token:
         return jsonify({"code": 4, "desc": "无效token!"}), 404
 
@@ -199,14 +186,17 @@ def find_password_set():
             return jsonify({"code": 4, "desc": "未找到用户!"}), 404
 
         user.set_password(password)
+        revoke_user_tokens(user)
         db.session.delete(token)
         db.session.commit()
+        evict_user(user.id, user.tokens_valid_after)
 
         return jsonify({"code": 0, "desc": "修改成功！"})
     return jsonify({"code": 2, "desc": "缺少数据"})
 
 
 @auth.route('/reqActivation', methods=["post"])
+@rate_limit("RATE_LIMIT_ACTIVATION")
 @login_required
 def req_activation():
     user: User | None = User.query.filter_by(username=current_user.username).first()
@@ -230,7 +220,7 @@ def req_activation():
 
 @auth.route('/activation', methods=["PUT"])
 def activation():
-    token = ActivationToken.query.filter_by(token=request.args.get('token', '')).first()
+    token = ActivationToken.query.filter_by(token_hash=hash_token(request.args.get('token', ''))).first()
     if not token:
         return jsonify({"code": 4, "desc": "无效token!"}), 404
 
@@ -243,8 +233,10 @@ def activation():
             return jsonify({"code": 4, "desc": "未找到用户!"}), 404
 
         user.status = 1
+        revoke_user_tokens(user)
         db.session.delete(token)
         db.session.commit()
+        evict_user(user.id, user.tokens_valid_after)
 
         return jsonify({"code": 0, "desc": "激活成功！"})
     return jsonify({"code": 2, "desc": "缺少数据"})
@@ -268,47 +260,77 @@ def send_reset_password(user):
         send_mail(APP, msg)
 
 
-def check_ip_registration_limit(ip):
-    one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-    registrations = RegistrationLimit.query.filter(
-        RegistrationLimit.ip == ip,
-        RegistrationLimit.register_time >= one_hour_ago
-    ).count()
-    return registrations >= 2
-
-
-def record_ip_registration(ip):
-    registration = RegistrationLimit(ip=ip)
-    db.session.add(registration)
-
-
-def generate_token(user, expires_in=3600):
+def generate_token(user, expires_in=3600, token_type: str | None = None):
+    now = datetime.now(timezone.utc)
+    # role 和 status 供无状态模式鉴权使用，jti 保证同一秒内签发的 token 也不相同
+    # iat 保留小数秒，和 tokens_valid_after 比较时同一秒内先后发生的签发和吊销也能分清
     payload = {
         "user_id": user.id,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=expires_in * 24),
+        "role": user.role,
+        "status": user.status,
+        "jti": uuid4().hex,
+        "iat": now.timestamp(),
+        "exp": now + timedelta(seconds=expires_in),
     }
+    # 只有登录 token 带 typ，邮件里的重置密码、激活 token 不能当作登录凭证使用
+    if token_type is not None:
+        payload["typ"] = token_type
     secret_key = current_app.config["SECRET_KEY"]
     token = jwt.encode(payload, secret_key, algorithm="HS256")
     return token
 
 
-def create_token(user, expires_in=3600 * 24 * 7):
-    token = generate_token(user, expires_in)
+def create_token(user, expires_in=TOKEN_LIFETIME):
+    token = generate_token(user, expires_in, token_type="access")
     new_token = Token(user_id=user.id, token=token, expires_in=expires_in)
     db.session.add(new_token)
+    evicted = enforce_token_limit(user.id)
     db.session.commit()
+    for token_hash in evicted:
+        evict_token(token_hash)
     return token
 
 
-def revoke_token(token):
-    token_record = Token.query.filter_by(token=token).first()
-    if token_record:
-        token_record.is_revoked = True
-        db.session.commit()
+def enforce_token_limit(user_id: int) -> list[bytes]:
+    """
+    每个用户只保留最近签发的 MAX_TOKENS_PER_USER 个有效 token，更早的标记为吊销
+    返回被吊销 token 的摘要，调用方提交后再清理缓存
+    """
+    limit = current_app.config["MAX_TOKENS_PER_USER"]
+    if limit <= 0:
+        return []
+
+    stale = (
+        db.session.query(Token.id, Token.token_hash)
+        .filter(
+            Token.user_id == user_id,
+            Token.is_revoked == False,
+            Token.expires_at > datetime.now(timezone.utc),
+        )
+        .order_by(Token.id.desc())
+        .offset(limit)
+        .all()
+    )
+    if stale:
+        Token.query.filter(Token.id.in_([row.id for row in stale])).update(
+            {Token.is_revoked: True}, synchronize_session=False
+        )
+    return [row.token_hash for row in stale]
+
+
+def revoke_token(token) -> bool:
+    token_hash = hash_token(token)
+    token_record = Token.query.filter_by(token_hash=token_hash).first()
+    if token_record is None:
+        return False
+    token_record.is_revoked = True
+    db.session.commit()
+    evict_token(token_hash)
+    return True
 
 
 def is_token_revoked(token):
-    token_record = Token.query.filter_by(token=token).first()
+    token_record = Token.query.filter_by(token_hash=hash_token(token)).first()
     if token_record and token_record.is_revoked:
         return True
     return False
@@ -316,7 +338,7 @@ def is_token_revoked(token):
 
 def verify_token(token, secret_key) -> int:
     try:
-        payload = jwt.decode(token, secret_key, algorithm="HS256")
+        payload = jwt.decode(token, secret_key, algorithms=["HS256"])
         user_id = payload["user_id"]
         return user_id
     except jwt.ExpiredSignatureError:
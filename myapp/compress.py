@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import struct
+import zlib
+
+from flask import Response, current_app, request
+
+from myapp.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，没有安装时只使用 gzip
+    brotli = None
+
+# (body 的 sha256, 编码) -> 压缩后的 body，只缓存被 mark_cacheable 标记过的响应
+compressed_cache: TTLCache = TTLCache(maxsize=256)
+
+# gzip 文件头：CM=8(deflate)，没有文件名等附加字段，MTIME=0，OS=255(未知)
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def available_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(encodings: list[str] | None = None) -> str | None:
+    """
+    根据 Accept-Encoding 选出客户端能接受的编码，都不能接受时返回 None
+    """
+    return request.accept_encodings.best_match(encodings or available_encodings())
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=current_app.config["COMPRESS_BROTLI_QUALITY"])
+    return gzip.compress(data, compresslevel=current_app.config["COMPRESS_LEVEL"], mtime=0)
+
+
+def mark_cacheable(response: Response) -> Response:
+    """
+    标记响应内容可以复用，相同内容的压缩结果会被缓存，只压缩一次
+    """
+    response.compress_cacheable = True  # type: ignore[attr-defined]
+    return response
+
+
+def should_compress(response: Response) -> bool:
+    if response.status_code != 200 or response.direct_passthrough:
+        return False
+    if "Content-Encoding" in response.headers or response.mimetype != "application/json":
+        return False
+    return response.content_length is not None and response.content_length >= current_app.config["COMPRESS_MIN_SIZE"]
+
+
+def compress_response(response: Response) -> Response:
+    """
+    after_request：按 Accept-Encoding 压缩较大的 JSON 响应
+    """
+    if not should_compress(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if getattr(response, "compress_cacheable", False):
+        key = (hashlib.sha256(data).digest(), encoding)
+        compressed = compressed_cache.get(key)
+        if compressed is None:
+            compressed = compress(data, encoding)
+            compressed_cache.set(key, compressed)
+    else:
+        compressed = compress(data, encoding)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # 同一个 ETag 不能对应不同编码的内容，压缩后改为弱 ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def deflate_tail(body: bytes) -> bytes:
+    """
+    body 单独压缩成以最后一个块结尾的裸 deflate 数据，可以接在任何按字节对齐的 deflate 数据后面
+    """
+    compressor = zlib.compressobj(current_app.config["COMPRESS_LEVEL"], zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush(zlib.Z_FINISH)
+
+
+def gzip_splice(prefix: bytes, body: bytes, tail: bytes) -> bytes:
+    """
+    拼出 prefix + body 的 gzip 数据，body 部分使用预先压缩好的 tail，每次请求只需要压缩很短的 prefix
+    prefix 用 Z_SYNC_FLUSH 结束，保证后面接上的 deflate 数据从字节边界开始
+    """
+    compressor = zlib.compressobj(current_app.config["COMPRESS_LEVEL"], zlib.DEFLATED, -zlib.MAX_WBITS)
+    head = compressor.compress(prefix) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    crc = zlib.crc32(body, zlib.crc32(prefix))
+    size = (len(prefix) + len(body)) & 0xFFFFFFFF
+    return GZIP_HEADER + head + tail + struct.pack("<II", crc, size)
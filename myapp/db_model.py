@@ -1,18 +1,41 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
 from enum import Enum, unique
 from typing import Optional
 
 from flask_login import UserMixin
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, String, Text, func
-from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy import (
+    BINARY,
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+    exists,
+    false,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.dialects.mysql import DATETIME, LONGTEXT
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from myapp import bcrypt, db
+from myapp import db
+from myapp.hashing import hash_password, needs_rehash, verify_password
 
 # steve avatar, auth.py import this
 DEFAULT_AVATAR = "8667ba71-b85a-4004-af54-457a9734eed7"
 
 
+def hash_token(token: str) -> bytes:
+    """
+    各类 token 在数据库里只保存定长的 sha256 摘要，索引更窄，比较也更快
+    """
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
 @unique
 class QuestionCategory(Enum):
     SINGLE_CHOICE = 1
@@ -38,6 +61,12 @@ class Survey(db.Model):
         DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp()
     )  # 问卷创建时间，默认为当前时间
     status: Mapped[int] = mapped_column(Integer, nullable=False)  # 问卷状态，！！！已废弃字段！！！
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1"
+    )  # 内容版本号，问卷、题目、选项、图片、排序变化时加一，用于缓存失效
+    full_score: Mapped[float] = mapped_column(
+        Float, nullable=False, default=0, server_default="0"
+    )  # 未被逻辑删除的题目的总分，和 version 一起维护
     questions: Mapped[list["Question"]] = relationship(
         "Question", backref="survey", lazy="select", cascade="all, delete"
     )  # 与问题表建立一对多关系，级联删除
@@ -50,6 +79,28 @@ class Survey(db.Model):
         self.description = description
         self.status = status
 
+    @staticmethod
+    def bump_version(*survey_ids: int) -> None:
+        """
+        问卷内容发生变化后调用，同时重新计算满分，由调用方负责 commit
+        必须在题目修改完之后调用，满分由数据库里的题目算出，这里先 flush 未写入的修改
+        """
+        ids = {sid for sid in survey_ids if sid is not None}
+        if not ids:
+            return
+        db.session.flush()
+        full_score = (
+            select(func.coalesce(func.sum(Question.score), 0))
+            .where(Question.survey_id == Survey.id, Question.logical_deletion.is_not(True))
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(Survey)
+            .where(Survey.id.in_(ids))
+            .values(version=Survey.version + 1, full_score=full_score)
+            .execution_options(synchronize_session=False)
+        )
+
 
 # 问题表模型
 class Question(db.Model):
@@ -169,15 +220,34 @@ class QuestionImgURL(db.Model):
         Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False
     )  # 所属问题id，外键，关联问题表，级联删除
     img_alt: Mapped[str] = mapped_column(String(200))  # 图片alt，允许为空
-    img_data: Mapped[str] = mapped_column(LONGTEXT, nullable=False)  # 图片数据，URL 或者 Base64 编码的图片，不允许为空
+    img_hash: Mapped[Optional[str]] = mapped_column(
+        String(64), nullable=True, index=True
+    )  # 图片内容的 sha256，图片文件保存在 image_store 里
+    img_data: Mapped[Optional[str]] = mapped_column(LONGTEXT, nullable=True)  # 外部图片的 URL，保存在本地的图片为空
+    thumb_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # 缩略图的 sha256
+    original_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 上传时的字节数
+    stored_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 压缩后实际保存的字节数
     create_time: Mapped[datetime] = mapped_column(
         DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp()
     )  # 选项创建时间，默认为当前时间
 
-    def __init__(self, question_id: int, img_alt: str, img_data: str):
+    def __init__(
+        self,
+        question_id: int,
+        img_alt: str,
+        img_data: str | None,
+        img_hash: str | None = None,
+        thumb_hash: str | None = None,
+        original_size: int | None = None,
+        stored_size: int | None = None,
+    ):
         self.question_id = question_id
         self.img_alt = img_alt
         self.img_data = img_data
+        self.img_hash = img_hash
+        self.thumb_hash = thumb_hash
+        self.original_size = original_size
+        self.stored_size = stored_size
 
 
 # 选项表模型
@@ -214,6 +284,12 @@ class User(UserMixin, db.Model):
     status: Mapped[int] = mapped_column(
         Integer, nullable=False, default=0
     )  # 0 未激活 1 正常 2 临时封禁 3 永久封禁 4 删除
+    tokens_valid_after: Mapped[Optional[datetime]] = mapped_column(
+        DateTime().with_variant(DATETIME(fsp=6), "mysql"), nullable=True
+    )  # 在此时间之前签发的 token 全部失效，改密码、封禁、改角色时更新，精确到微秒，同一秒内先签发的 token 也会失效
+    play_permission: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )  # 名下是否有白名单，白名单增删时由 refresh_play_permission 同步
     tokens: Mapped[list["Token"]] = relationship("Token", backref="user", lazy="select")
     whitelist: Mapped[list["Whitelist"]] = relationship("Whitelist", backref="wl_user", lazy="select")
     guarantees: Mapped[list["Guarantee"]] = relationship(
@@ -244,16 +320,46 @@ class User(UserMixin, db.Model):
         self.role = role
 
     def set_password(self, password) -> "User":
-        self.password = bcrypt.generate_password_hash(password).decode("utf-8")
+        self.password = hash_password(password)
         return self
 
     def check_password(self, password) -> bool:
-        return bcrypt.check_password_hash(self.password, password)
+        return verify_password(self.password, password)
+
+    def password_needs_rehash(self) -> bool:
+        """
+        BCRYPT_LOG_ROUNDS 修改后，旧的哈希会在用户下次登录成功时升级
+        """
+        return needs_rehash(self.password)
+
+    @staticmethod
+    def refresh_play_permission(user_id: int | None) -> None:
+        """
+        按 whitelist 表重新计算 play_permission，在增删白名单之后、commit 之前调用
+        """
+        if user_id is None:
+            return
+        db.session.flush()
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(play_permission=exists().where(Whitelist.user_id == user_id))
+            .execution_options(synchronize_session=False)
+        )
 
 
 # 答卷表模型
 class Response(db.Model):
     __tablename__ = "responses"  # 指定表名
+    __table_args__ = (
+        db.Index("ix_responses_user_id_is_completed", "user_id", "is_completed"),  # 查找用户未完成的答卷
+        db.Index("ix_responses_is_completed_create_time", "is_completed", "create_time"),  # 定时任务查找过期答卷
+        db.Index("ix_responses_create_time", "create_time"),  # 答卷列表按创建时间筛选和排序
+        db.Index(
+            "ix_responses_survey_id_is_reviewed_is_completed", "survey_id", "is_reviewed", "is_completed"
+        ),  # 问卷概览按问卷分组统计
+        db.UniqueConstraint("user_id", "idempotency_key", name="uq_responses_user_id_idempotency_key"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)  # 主键，答卷唯一标识，自增
     is_completed: Mapped[bool] = mapped_column(Boolean, default=False)  # 完成状态，默认为False（未完成）
     is_reviewed: Mapped[int] = mapped_column(Integer, default=0)  # 阅卷状态，0 待审核 1 已通过 2 已拒绝
@@ -280,13 +386,31 @@ class Response(db.Model):
         "ResponseScore", backref="response_s", lazy="select", cascade="all, delete"
     )
     archive_score: Mapped[float] = mapped_column(Float, nullable=True)
+    revision_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("survey_revisions.id"), nullable=True
+    )  # 作答时的问卷版本，旧数据为空
+    idempotency_key: Mapped[Optional[str]] = mapped_column(
+        String(64), nullable=True
+    )  # 提交答卷时客户端带的 Idempotency-Key，同一用户内唯一，重试时用来找回第一次提交的结果
+    submitted_score: Mapped[Optional[float]] = mapped_column(
+        Float, nullable=True
+    )  # 提交时返回给用户的客观题得分，重试时原样返回，之后阅卷改分不影响它
 
-    def __init__(self, user_id: int, survey_id: int, survey_name: str, player_name: str, player_uuid: str):
+    def __init__(
+        self,
+        user_id: int,
+        survey_id: int,
+        survey_name: str,
+        player_name: str,
+        player_uuid: str,
+        revision_id: int | None = None,
+    ):
         self.user_id = user_id
         self.survey_id = survey_id
         self.survey_name = survey_name
         self.player_name = player_name
         self.player_uuid = player_uuid
+        self.revision_id = revision_id
 
 
 class ResponseScore(db.Model):
@@ -325,6 +449,24 @@ class ResponseDetail(db.Model):
         self.answer = answer
 
 
+# 打包保存的答题详情，每份答卷一行
+class ResponseAnswers(db.Model):
+    __tablename__ = "response_answers"
+    response_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("responses.id", ondelete="CASCADE"), primary_key=True
+    )  # 所属答卷id，同时也是主键
+    answers: Mapped[str] = mapped_column(
+        LONGTEXT, nullable=False
+    )  # JSON：{"题目id": ["答案", ...]}，选择题存储选项id，填空、简答题存储答案文本
+    create_time: Mapped[datetime] = mapped_column(
+        DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp()
+    )
+
+    def __init__(self, response_id: int, answers: str):
+        self.response_id = response_id
+        self.answers = answers
+
+
 class Guarantee(db.Model):
     __tablename__ = "guarantees"  # 指定表名
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)  # 主键，担保唯一标识，自增
@@ -375,16 +517,19 @@ class Whitelist(db.Model):
 
 
 class Token(db.Model):
+    __table_args__ = (
+        db.Index("ix_token_is_revoked_expires_at", "is_revoked", "expires_at"),  # 清理任务按吊销状态分批删除
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
-    token: Mapped[str] = mapped_column(String(256), unique=True, nullable=False)
+    token_hash: Mapped[bytes] = mapped_column(BINARY(32), unique=True, nullable=False)  # token 的 sha256 摘要
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp())
-    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
 
     def __init__(self, user_id, token, expires_in=3600):
         self.user_id = user_id
-        self.token = token
+        self.token_hash = hash_token(token)
         self.expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
 
@@ -393,46 +538,66 @@ class SurveySlot(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     slot_name: Mapped[str] = mapped_column(String(25), nullable=False)
     mounted_survey_id: Mapped[int] = mapped_column(Integer, ForeignKey("surveys.id"), nullable=False)
+    revision_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("survey_revisions.id"), nullable=True
+    )  # 挂载时冻结的问卷版本，之后对问卷的修改需要重新挂载才会生效
 
-    def __init__(self, slot_name: str, survey_id: int):
+    def __init__(self, slot_name: str, survey_id: int, revision_id: int | None = None):
         self.slot_name = slot_name
         self.mounted_survey_id = survey_id
+        self.revision_id = revision_id
 
 
-class RegistrationLimit(db.Model):
-    __tablename__ = "registration_limits"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    ip: Mapped[str] = mapped_column(String(45), nullable=False)  # 支持IPv6的最大长度
-    register_time = db.Column(db.DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp())
-    def __init__(self, ip):
-        self.ip = ip
+class SurveyRevision(db.Model):
+    """
+    问卷发布时冻结的完整内容（题目、选项、图片、正确答案），写入后不再修改
+    同一个问卷的同一个版本号只保存一份
+    """
+    __tablename__ = "survey_revisions"
+    __table_args__ = (db.UniqueConstraint("survey_id", "version", name="uq_survey_revisions_survey_id_version"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    survey_id: Mapped[int] = mapped_column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)  # 冻结时 Survey.version 的值
+    content: Mapped[str] = mapped_column(LONGTEXT, nullable=False)  # JSON 格式的问卷内容
+    full_score: Mapped[float] = mapped_column(
+        Float, nullable=False, default=0, server_default="0"
+    )  # 冻结时的满分
+    create_time: Mapped[datetime] = mapped_column(
+        DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp()
+    )
+
+    def __init__(self, survey_id: int, version: int, content: str, full_score: float = 0):
+        self.survey_id = survey_id
+        self.version = version
+        self.content = content
+        self.full_score = full_score
 
 
 class ResetPasswordToken(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
-    token: Mapped[str] = mapped_column(String(256), unique=True, nullable=False)
+    token_hash: Mapped[bytes] = mapped_column(BINARY(32), unique=True, nullable=False)  # token 的 sha256 摘要
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.utc_timestamp(), server_default=func.utc_timestamp())
-    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
 
     def __init__(self, user_id, token, expires_in=3600):
         self.user_id = user_id
-        self.token = token
+        self.token_hash = hash_token(token)
         self.expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
 
 class ActivationToken(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
-    token: Mapped[str] = mapped_column(String(256), unique=True, nullable=False)
+    token_hash: Mapped[bytes] = mapped_column(BINARY(32), unique=True, nullable=False)  # token 的 sha256 摘要
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.utc_timestamp())
-    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
 
     def __init__(self, user_id, token, expires_in=3600):
         self.user_id = user_id
-        self.token = token
+        self.token_hash = hash_token(token)
         self.expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
 
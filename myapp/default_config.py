@@ -83,5 +83,202 @@ DEFAULT_CONFIG = [
         'type': 'int',
         'desc': '单位：小时',
     },
+    {
+        'key': 'TOKEN_CACHE_TTL',
+        'value': '300',
+        'type': 'int',
+        'desc': '单位：秒，token 鉴权缓存的最长有效时间，多进程部署时决定状态变更的最大延迟',
+    },
+    {
+        'key': 'JWT_STATELESS',
+        'value': 'False',
+        'type': 'bool',
+        'desc': 'True 或者 False，开启后鉴权只在本地校验 JWT 签名和有效期，不再逐个请求查询 token 表',
+    },
+    {
+        'key': 'JWT_REVOCATION_REFRESH',
+        'value': '30',
+        'type': 'int',
+        'desc': '单位：秒，无状态模式下吊销列表的刷新间隔',
+    },
+    {
+        'key': 'MAX_TOKENS_PER_USER',
+        'value': '10',
+        'type': 'int',
+        'desc': '每个用户同时有效的登录 token 上限，超出时吊销最早签发的，0 代表不限制',
+    },
+    {
+        'key': 'TOKEN_PURGE_BATCH',
+        'value': '1000',
+        'type': 'int',
+        'desc': '清理过期 token 时每批删除的行数',
+    },
+    {
+        'key': 'MAINTENANCE_INTERVAL',
+        'value': '0',
+        'type': 'int',
+        'desc': '单位：分钟，后台定时清理任务的执行间隔，0 代表不启用，修改后需要重启才能启用',
+    },
+    {
+        'key': 'BCRYPT_LOG_ROUNDS',
+        'value': '12',
+        'type': 'int',
+        'desc': 'bcrypt 的计算成本，修改后旧密码会在用户下次登录时自动升级',
+    },
+    {
+        'key': 'PASSWORD_HASH_WORKERS',
+        'value': '2',
+        'type': 'int',
+        'desc': '计算密码哈希的进程数，0 代表在请求线程里直接计算，修改后需要重启',
+    },
+    {
+        'key': 'PASSWORD_HASH_QUEUE',
+        'value': '16',
+        'type': 'int',
+        'desc': '等待计算密码哈希的最大请求数，超出时直接返回繁忙，修改后需要重启',
+    },
+    {
+        'key': 'RATE_LIMIT_STORAGE',
+        'value': '',
+        'type': 'str',
+        'desc': '限流计数使用的 SQLite 文件路径，为空时使用 instance/rate_limit.sqlite3',
+    },
+    {
+        'key': 'RATE_LIMIT_LOGIN',
+        'value': '10/60',
+        'type': 'str',
+        'desc': '格式：次数/秒数，同一 IP 的登录频率限制，为空时不限制',
+    },
+    {
+        'key': 'RATE_LIMIT_REGISTER',
+        'value': '5/3600',
+        'type': 'str',
+        'desc': '格式：次数/秒数，同一 IP 的注册频率限制，为空时不限制',
+    },
+    {
+        'key': 'RATE_LIMIT_FIND_PASSWORD',
+        'value': '5/3600',
+        'type': 'str',
+        'desc': '格式：次数/秒数，同一 IP 的找回密码频率限制，为空时不限制',
+    },
+    {
+        'key': 'RATE_LIMIT_ACTIVATION',
+        'value': '5/3600',
+        'type': 'str',
+        'desc': '格式：次数/秒数，同一 IP 的激活邮件频率限制，为空时不限制',
+    },
+    {
+        'key': 'RATE_LIMIT_GUARANTEE',
+        'value': '10/3600',
+        'type': 'str',
+        'desc': '格式：次数/秒数，同一 IP 的担保申请频率限制，为空时不限制',
+    },
+    {
+        'key': 'LOGIN_LOCKOUT_THRESHOLD',
+        'value': '5',
+        'type': 'int',
+        'desc': '同一用户名连续登录失败多少次后开始锁定',
+    },
+    {
+        'key': 'LOGIN_LOCKOUT_IP_THRESHOLD',
+        'value': '20',
+        'type': 'int',
+        'desc': '同一 IP 连续登录失败多少次后开始锁定',
+    },
+    {
+        'key': 'LOGIN_LOCKOUT_BASE',
+        'value': '30',
+        'type': 'int',
+        'desc': '单位：秒，首次锁定的时长，之后每多失败一次翻倍',
+    },
+    {
+        'key': 'LOGIN_LOCKOUT_MAX',
+        'value': '3600',
+        'type': 'int',
+        'desc': '单位：秒，单次锁定的最长时长，也是失败记录的保留时长',
+    },
+    {
+        'key': 'IMAGE_STORAGE',
+        'value': '',
+        'type': 'str',
+        'desc': '题目图片的保存目录，为空时使用 instance/images',
+    },
+    {
+        'key': 'IMAGE_MAX_SIDE',
+        'value': '1920',
+        'type': 'int',
+        'desc': '单位：像素，题目图片长边的最大尺寸，超过时等比缩小',
+    },
+    {
+        'key': 'IMAGE_FORMAT',
+        'value': 'WEBP',
+        'type': 'str',
+        'desc': '题目图片重新编码的格式，WEBP 或 JPEG',
+    },
+    {
+        'key': 'IMAGE_QUALITY',
+        'value': '80',
+        'type': 'int',
+        'desc': '题目图片重新编码的质量，1-100',
+    },
+    {
+        'key': 'IMAGE_THUMB_SIDE',
+        'value': '320',
+        'type': 'int',
+        'desc': '单位：像素，缩略图长边的尺寸',
+    },
+    {
+        'key': 'IMAGE_PROCESS_WORKERS',
+        'value': '2',
+        'type': 'int',
+        'desc': '处理题目图片的进程数，0 代表在请求线程里直接处理',
+    },
+    {
+        'key': 'COMPRESS_MIN_SIZE',
+        'value': '1024',
+        'type': 'int',
+        'desc': '单位：字节，超过这个大小的 JSON 响应才会压缩',
+    },
+    {
+        'key': 'COMPRESS_LEVEL',
+        'value': '6',
+        'type': 'int',
+        'desc': 'gzip 压缩等级，1-9',
+    },
+    {
+        'key': 'COMPRESS_BROTLI_QUALITY',
+        'value': '5',
+        'type': 'int',
+        'desc': 'brotli 压缩质量，0-11，需要安装 brotli',
+    },
+    {
+        'key': 'RESPONSE_PACKED_ANSWERS',
+        'value': 'True',
+        'type': 'bool',
+        'desc': 'True 或者 False，每份答卷的答案打包存为 response_answers 的一行，关闭时逐条存入 response_details',
+    },
+    {
+        'key': 'RESPONSE_EXPIRE_BATCH',
+        'value': '1000',
+        'type': 'int',
+        'desc': '把过期未提交的答卷标记为已拒绝时每批更新的行数',
+    },
+    {
+        'key': 'PAGINATION_COUNT_TTL',
+        'value': '60',
+        'type': 'int',
+        'desc': '单位：秒，管理列表的总数缓存时间，0 代表每次请求都重新统计',
+    },
+    {
+        'key': 'PROXY_COUNT',
+        'value': '1',
+        'type': 'int',
+        'desc': '应用前面的反向代理层数，用于从 X-Forwarded-For 取客户端 IP，直接对外提供服务时设为 0，修改后需要重启',
+    },
+    {
+        'key': 'PUBLIC_BASE_URL',
+        'value': '',
+        'type': 'str',
+        'desc': '后端对外的地址，例如 https://exam.example.com，用于生成图片链接，为空时返回以 / 开头的路径',
+    },
 ]
-
@@ -7,6 +7,7 @@ from flask_login import current_user, login_required
 from myapp import db, APP
 from myapp.db_model import Guarantee, User, Whitelist
 from myapp.mail import guarantee_result_mail, send_mail
+from myapp.rate_limit import rate_limit
 from myapp.utils import status_check
 
 guarantee = Blueprint("guarantee", __name__)
@@ -69,6 +70,7 @@ def returnData(i: Guarantee):
     }
 
 @guarantee.route("/request", methods=["POST"])
+@rate_limit("RATE_LIMIT_GUARANTEE")
 @login_required
 @status_check()
 def add_guarantee():
@@ -173,6 +175,7 @@ def guarantee_user_action():
                         source=1,
                         auditor_uid=current_user.id
                 ))
+                User.refresh_play_permission(_guarantee.applicant_id)
 
                 _guarantee.status = 1
                 db.session.commit()
@@ -0,0 +1,72 @@
+import os
+from threading import BoundedSemaphore, Lock
+
+import bcrypt
+from flask import current_app
+
+from myapp.process_pool import ProcessPool
+
+
+class PasswordHashOverload(Exception):
+    """
+    等待计算的密码哈希超过了 PASSWORD_HASH_QUEUE，直接拒绝请求而不是继续排队
+    """
+
+
+_pool = ProcessPool()
+_slots: BoundedSemaphore | None = None
+_owner_pid: int | None = None
+_lock = Lock()
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def _get_slots(workers: int) -> BoundedSemaphore:
+    """
+    排队名额和进程池一样，每个 gunicorn worker 各自拥有
+    """
+    global _slots, _owner_pid
+    with _lock:
+        if _slots is None or _owner_pid != os.getpid():
+            _slots = BoundedSemaphore(workers + current_app.config["PASSWORD_HASH_QUEUE"])
+            _owner_pid = os.getpid()
+        return _slots
+
+
+def _run(fn, *args):
+    workers = current_app.config["PASSWORD_HASH_WORKERS"]
+    if workers <= 0:
+        return fn(*args)
+
+    slots = _get_slots(workers)
+    if not slots.acquire(blocking=False):
+        raise PasswordHashOverload()
+    try:
+        return _pool.run(workers, fn, *args)
+    finally:
+        slots.release()
+
+
+def hash_password(password: str) -> str:
+    rounds = current_app.config["BCRYPT_LOG_ROUNDS"]
+    return _run(_hashpw, password.encode("utf-8"), rounds).decode("utf-8")
+
+
+def verify_password(hashed: str, password: str) -> bool:
+    return _run(_checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+def needs_rehash(hashed: str) -> bool:
+    """
+    bcrypt 哈希的格式是 $2b$<cost>$...，cost 和当前配置不一致时需要重新计算
+    """
+    try:
+        return int(hashed.split("$")[2]) != current_app.config["BCRYPT_LOG_ROUNDS"]
+    except (IndexError, ValueError):
+        return True
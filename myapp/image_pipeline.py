@@ -0,0 +1,131 @@
+from io import BytesIO
+from typing import NamedTuple
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from myapp.image_store import decode_image_data, image_exists, IMAGE_URL_PATTERN, store_image
+from myapp.process_pool import ProcessPool
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    thumb: bytes | None
+
+
+class IngestedImage(NamedTuple):
+    img_hash: str | None
+    img_data: str | None  # 外部链接
+    thumb_hash: str | None
+    original_size: int | None
+    stored_size: int | None
+
+
+_pool = ProcessPool()
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = BytesIO()
+    if fmt == "JPEG":
+        # JPEG 不支持透明通道，铺一层白底
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buf, "WEBP", quality=quality, method=4)
+    return buf.getvalue()
+
+
+def process_image(data: bytes, max_side: int, fmt: str, quality: int, thumb_side: int) -> ProcessedImage | None:
+    """
+    在子进程里执行：限制尺寸、重新编码并生成缩略图，无法识别的图片返回 None
+    动图只生成缩略图，原图保持不变；重新编码后反而更大时也保留原图
+    """
+    try:
+        with Image.open(BytesIO(data)) as img:
+            # exif_transpose 返回的是副本，要在这之前判断是不是动图
+            animated = getattr(img, "is_animated", False)
+            img = ImageOps.exif_transpose(img)
+
+            thumb_img = img.copy()
+            thumb_img.thumbnail((thumb_side, thumb_side), Image.Resampling.LANCZOS)
+            thumb = _encode(thumb_img, fmt, quality)
+
+            if animated:
+                return ProcessedImage(data, thumb)
+
+            resized = max(img.size) > max_side
+            if resized:
+                img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            encoded = _encode(img, fmt, quality)
+            if not resized and len(encoded) >= len(data):
+                encoded = data
+            return ProcessedImage(encoded, thumb)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _existing_image(digest: str) -> IngestedImage:
+    # 编辑题目时提交回来的是已有图片，沿用之前处理的结果
+    from myapp.db_model import QuestionImgURL
+
+    row: QuestionImgURL | None = QuestionImgURL.query.filter_by(img_hash=digest).first()
+    if row is None:
+        return IngestedImage(digest, None, None, None, None)
+    return IngestedImage(digest, None, row.thumb_hash, row.original_size, row.stored_size)
+
+
+def ingest_images(values: list[str]) -> list[IngestedImage]:
+    """
+    批量处理提交上来的图片，解码出来的图片并行交给进程池处理，返回结果和 values 一一对应
+    """
+    config = current_app.config
+    args = (
+        config["IMAGE_MAX_SIDE"],
+        config["IMAGE_FORMAT"].upper(),
+        config["IMAGE_QUALITY"],
+        config["IMAGE_THUMB_SIDE"],
+    )
+    workers = config["IMAGE_PROCESS_WORKERS"]
+
+    results: list[IngestedImage | None] = [None] * len(values)
+    pending: dict[int, bytes] = {}
+    for index, value in enumerate(values):
+        if image_exists(value):
+            results[index] = _existing_image(value)
+            continue
+
+        match = IMAGE_URL_PATTERN.search(value)
+        if match and image_exists(match.group(1)):
+            results[index] = _existing_image(match.group(1))
+            continue
+
+        data = decode_image_data(value)
+        if not data:
+            results[index] = IngestedImage(None, value, None, None, None)
+        else:
+            pending[index] = data
+
+    if workers > 0 and len(pending) > 0:
+        # 和密码哈希共用同一套进程池实现，子进程被杀掉后会重建进程池再重试一次
+        outputs = _pool.run_all(workers, process_image, [(data, *args) for data in pending.values()])
+        processed = dict(zip(pending.keys(), outputs))
+    else:
+        processed = {index: process_image(data, *args) for index, data in pending.items()}
+
+    for index, data in pending.items():
+        item = processed[index]
+        stored = data if item is None else item.data
+        results[index] = IngestedImage(
+            img_hash=store_image(stored),
+            img_data=None,
+            thumb_hash=None if item is None or item.thumb is None else store_image(item.thumb),
+            original_size=len(data),
+            stored_size=len(stored),
+        )
+    return results  # type: ignore
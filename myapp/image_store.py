@@ -0,0 +1,117 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import current_app, url_for
+
+# 题目图片按内容的 sha256 保存在本地磁盘上：<IMAGE_STORAGE>/<前两位>/<完整摘要>
+# 相同的图片只保存一份，文件写入后不再修改，可以被客户端永久缓存
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# 管理端编辑题目时会把接口返回的图片地址原样提交回来
+IMAGE_URL_PATTERN = re.compile(r"/survey/image/([0-9a-f]{64})$")
+DATA_URL_PATTERN = re.compile(r"^data:[\w.+-]+/[\w.+-]+;base64,", re.IGNORECASE)
+
+MAGIC_NUMBERS = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+def storage_root() -> str:
+    return current_app.config["IMAGE_STORAGE"] or os.path.join(current_app.instance_path, "images")
+
+
+def image_path(digest: str) -> str:
+    return os.path.join(storage_root(), digest[:2], digest)
+
+
+def image_exists(digest: str) -> bool:
+    return HASH_PATTERN.match(digest) is not None and os.path.isfile(image_path(digest))
+
+
+def store_image(data: bytes) -> str:
+    """
+    保存图片并返回摘要，已经存在的图片不会重复写入
+    先写临时文件再原子替换，并发写同一张图片也不会读到半个文件
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = image_path(digest)
+    if os.path.isfile(path):
+        return digest
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest
+
+
+def decode_image_data(value: str) -> bytes | None:
+    """
+    解析 data URL 或者裸的 base64，无法解析时返回 None
+    裸的 base64 只有解码出来是可识别的图片格式才算数，避免把普通字符串当成图片
+    """
+    match = DATA_URL_PATTERN.match(value)
+    raw = value[match.end():] if match else value
+    try:
+        data = base64.b64decode(raw, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+    if not match and sniff_mimetype(data[:16]) == "application/octet-stream":
+        return None
+    return data
+
+
+def sniff_mimetype(head: bytes) -> str:
+    for magic, mimetype in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def image_url(digest: str) -> str:
+    """
+    图片地址不使用请求的 Host，反向代理后面拿到的是 127.0.0.1:5000 这样的内部地址
+    配置了 PUBLIC_BASE_URL 时返回完整地址，否则返回以 / 开头的路径
+    """
+    path = url_for("survey.get_image", digest=digest)
+    base_url = current_app.config["PUBLIC_BASE_URL"].rstrip("/")
+    return f"{base_url}{path}" if base_url else path
+
+
+def image_record(img) -> dict:
+    """
+    QuestionImgURL 转换为普通的 dict，问卷版本里保存的就是这个格式
+    """
+    return {"alt": img.img_alt, "hash": img.img_hash, "data": img.img_data, "thumb_hash": img.thumb_hash}
+
+
+def image_json(record: dict) -> dict:
+    """
+    题目图片的返回格式，data 仍然是可以直接放进 <img src> 的地址，保持和旧接口兼容
+    """
+    if record["hash"]:
+        return {
+            "alt": record["alt"],
+            "hash": record["hash"],
+            "data": image_url(record["hash"]),
+            "thumb": image_url(record["thumb_hash"]) if record["thumb_hash"] else None,
+        }
+    return {"alt": record["alt"], "hash": None, "data": record["data"], "thumb": None}
@@ -0,0 +1,94 @@
+import time
+from threading import Lock
+from typing import NamedTuple
+
+from flask import current_app
+
+from myapp.cache import TTLCache
+
+
+class FailureRecord(NamedTuple):
+    failures: int
+    locked_until: float  # time.time() 时间戳
+    last_failure: float
+
+
+class LoginLockout:
+    """
+    登录失败计数，按用户名和 IP 分别统计，连续失败达到阈值后按指数退避锁定
+    锁定期间的登录请求直接拒绝，不查询 users 表也不计算 bcrypt
+    计数只保存在当前进程内，最后一次失败 LOGIN_LOCKOUT_MAX 秒后自动清除
+    """
+
+    def __init__(self):
+        # 未锁定的记录放在 LRU 缓存里，用大量新用户名刷失败次数最多只会挤掉别人未达到阈值的计数
+        # 已锁定的记录单独保存，只按时间过期，不受容量淘汰影响，刷再多用户名也不会解除已有的锁定和退避
+        self._pending: TTLCache = TTLCache(maxsize=10000)
+        self._locked: dict[str, FailureRecord] = {}
+        self._next_prune = 0.0
+        self._lock = Lock()
+
+    def _prune_locked(self, now: float, maximum: float) -> None:
+        """
+        删除最后一次失败超过 LOGIN_LOCKOUT_MAX 秒的锁定记录，最多每分钟执行一次，调用方持有 self._lock
+        """
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        for key in [key for key, record in self._locked.items() if record.last_failure + maximum <= now]:
+            del self._locked[key]
+
+    @staticmethod
+    def user_key(username: str) -> str:
+        return f"user:{username}"
+
+    @staticmethod
+    def ip_key(ip: str | None) -> str:
+        return f"ip:{ip}"
+
+    def remaining(self, *keys: str) -> float:
+        """
+        返回这些 key 中最长的剩余锁定秒数，未锁定时返回 0
+        """
+        now = time.time()
+        remaining = 0.0
+        for key in keys:
+            record: FailureRecord | None = self._locked.get(key)
+            if record is not None:
+                remaining = max(remaining, record.locked_until - now)
+        return remaining
+
+    def record_failure(self, key: str, threshold: int) -> None:
+        base = current_app.config["LOGIN_LOCKOUT_BASE"]
+        maximum = current_app.config["LOGIN_LOCKOUT_MAX"]
+        now = time.time()
+        with self._lock:
+            self._prune_locked(now, maximum)
+            record: FailureRecord | None = self._locked.get(key)
+            if record is not None and record.last_failure + maximum <= now:
+                record = None
+            if record is None:
+                record = self._pending.get(key)
+            failures = 1 if record is None else record.failures + 1
+            if failures >= threshold:
+                locked_until = now + min(base * 2 ** (failures - threshold), maximum)
+                self._locked[key] = FailureRecord(failures, locked_until, now)
+                self._pending.pop(key)
+            else:
+                self._pending.set(key, FailureRecord(failures, 0.0, now), ttl=maximum)
+
+    def reset(self, key: str) -> bool:
+        with self._lock:
+            locked = self._locked.pop(key, None) is not None
+            pending = self._pending.pop(key) is not None
+        return locked or pending
+
+    def snapshot(self) -> list[tuple[str, FailureRecord]]:
+        maximum = current_app.config["LOGIN_LOCKOUT_MAX"]
+        now = time.time()
+        with self._lock:
+            locked = [(key, record) for key, record in self._locked.items() if record.last_failure + maximum > now]
+        return locked + self._pending.items()
+
+
+login_lockout: LoginLockout = LoginLockout()
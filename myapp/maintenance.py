@@ -0,0 +1,178 @@
+import time
+from datetime import datetime, timezone
+from threading import Thread
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from myapp import db
+from myapp.db_model import ActivationToken, ResetPasswordToken, Response, Token
+from myapp.utils import response_expire_cutoff
+
+
+def delete_in_batches(model, condition, batch_size: int) -> dict:
+    """
+    按主键分批删除满足条件的行，每批单独提交，避免长时间持有大量行锁
+    lock_seconds 统计的是每批从执行 DELETE 到提交完成的耗时之和
+    """
+    rows = 0
+    lock_seconds = 0.0
+    started = time.perf_counter()
+
+    while True:
+        ids = [row.id for row in db.session.query(model.id).filter(condition).limit(batch_size).all()]
+        if not ids:
+            break
+
+        lock_started = time.perf_counter()
+        rows += db.session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        lock_seconds += time.perf_counter() - lock_started
+
+        if len(ids) < batch_size:
+            break
+
+    seconds = time.perf_counter() - started
+    return {
+        "table": model.__tablename__,
+        "rows": rows,
+        "seconds": seconds,
+        "lock_seconds": lock_seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+    }
+
+
+def update_in_batches(model, condition, values: dict, batch_size: int) -> dict:
+    """
+    按主键分批更新满足条件的行，更新后的行不再满足条件，每批单独提交
+    UPDATE 里重复一次条件，这期间被其它请求改掉的行不会被覆盖
+    """
+    rows = 0
+    lock_seconds = 0.0
+    started = time.perf_counter()
+
+    while True:
+        ids = [row.id for row in db.session.query(model.id).filter(condition).limit(batch_size).all()]
+        if not ids:
+            break
+
+        lock_started = time.perf_counter()
+        rows += (
+            db.session.query(model)
+            .filter(model.id.in_(ids), condition)
+            .update(values, synchronize_session=False)
+        )
+        db.session.commit()
+        lock_seconds += time.perf_counter() - lock_started
+
+        if len(ids) < batch_size:
+            break
+
+    seconds = time.perf_counter() - started
+    return {
+        "table": model.__tablename__,
+        "action": "更新",
+        "rows": rows,
+        "seconds": seconds,
+        "lock_seconds": lock_seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+    }
+
+
+def purge_expired_tokens(batch_size: int | None = None) -> list[dict]:
+    """
+    删除已过期的 Token、ResetPasswordToken、ActivationToken
+    已吊销但未过期的 Token 在无状态模式下还要用来构建吊销列表，只有关闭该模式时才删除
+    """
+    if batch_size is None:
+        batch_size = current_app.config["TOKEN_PURGE_BATCH"]
+    now = datetime.now(timezone.utc)
+
+    stats = [
+        delete_in_batches(model, model.expires_at < now, batch_size)
+        for model in (Token, ResetPasswordToken, ActivationToken)
+    ]
+    if not current_app.config["JWT_STATELESS"]:
+        revoked = delete_in_batches(Token, Token.is_revoked == True, batch_size)
+        revoked["table"] += " (revoked)"
+        stats.append(revoked)
+    return stats
+
+
+def expire_stale_responses(batch_size: int | None = None) -> list[dict]:
+    """
+    把超过 RESPONSE_VALIDITY_PERIOD 仍未提交的答卷标记为已完成、已拒绝
+    """
+    if batch_size is None:
+        batch_size = current_app.config["RESPONSE_EXPIRE_BATCH"]
+
+    condition = (Response.is_completed == False) & (Response.create_time < response_expire_cutoff())
+    stats = update_in_batches(Response, condition, {"is_completed": True, "is_reviewed": 2}, batch_size)
+    stats["table"] += " (expired)"
+    return [stats]
+
+
+def format_stats(item: dict) -> str:
+    return (
+        f'{item["table"]}: {item.get("action", "删除")} {item["rows"]} 行，耗时 {item["seconds"]:.2f}s，'
+        f'{item["rows_per_sec"]:.0f} 行/秒，锁定 {item["lock_seconds"]:.3f}s'
+    )
+
+
+@click.command("purge-tokens")
+@click.option("--batch-size", type=int, default=None, help="每批删除的行数，默认读取 TOKEN_PURGE_BATCH")
+@with_appcontext
+def purge_tokens_command(batch_size: int | None) -> None:
+    """
+    清理过期或已吊销的 token
+    flask --app main.py purge-tokens
+    """
+    for item in purge_expired_tokens(batch_size):
+        click.echo(format_stats(item))
+
+
+@click.command("expire-responses")
+@click.option("--batch-size", type=int, default=None, help="每批更新的行数，默认读取 RESPONSE_EXPIRE_BATCH")
+@with_appcontext
+def expire_responses_command(batch_size: int | None) -> None:
+    """
+    把过期未提交的答卷标记为已拒绝
+    flask --app main.py expire-responses
+    """
+    for item in expire_stale_responses(batch_size):
+        click.echo(format_stats(item))
+
+
+# 定时任务列表，每次调度依次执行
+MAINTENANCE_JOBS = [purge_expired_tokens, expire_stale_responses]
+
+
+def run_maintenance(app: Flask) -> None:
+    with app.app_context():
+        for job in MAINTENANCE_JOBS:
+            try:
+                for item in job():
+                    app.logger.info(format_stats(item))
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"定时任务 {job.__name__} 执行失败: {e}")
+
+
+def maintenance_loop(app: Flask) -> None:
+    while True:
+        # 每轮重新读取间隔，管理员修改配置后无需重启
+        interval = app.config["MAINTENANCE_INTERVAL"]
+        time.sleep(max(interval, 1) * 60)
+        if app.config["MAINTENANCE_INTERVAL"] > 0:
+            run_maintenance(app)
+
+
+def start_scheduler(app: Flask) -> None:
+    """
+    MAINTENANCE_INTERVAL 大于 0 时在后台线程里定时执行清理任务
+    多个 gunicorn worker 会各自执行，分批删除和带条件的分批更新都可以安全地并发
+    """
+    if app.config["MAINTENANCE_INTERVAL"] <= 0:
+        return
+    Thread(target=maintenance_loop, args=[app], daemon=True).start()
@@ -0,0 +1,117 @@
+import base64
+import binascii
+import json
+from collections.abc import Hashable
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from flask import current_app, request
+from sqlalchemy import DateTime, and_, or_
+
+from myapp.cache import TTLCache
+
+# 列表总数缓存，key 由调用方决定，需要包含所有筛选条件
+count_cache: TTLCache = TTLCache(maxsize=256)
+
+
+class InvalidCursor(Exception):
+    """
+    ?after= 的游标无法解析
+    """
+
+
+class Page(NamedTuple):
+    items: list
+    size: int
+    total: int
+    page: int | None  # 游标模式下为 None
+    next: str | None  # 下一页的游标，没有下一页或者页码模式下为 None
+
+    def meta(self) -> dict:
+        """
+        合并到列表接口返回数据里的分页信息
+        """
+        if self.page is None:
+            return {"size": self.size, "total": self.total, "next": self.next}
+        return {"page": self.page, "size": self.size, "total": self.total}
+
+
+def encode_cursor(sort_value: Any, id_: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, id_ = json.loads(raw)
+        if isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(id_)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor()
+
+
+def cached_count(key: Hashable, query) -> int:
+    """
+    列表总数按 PAGINATION_COUNT_TTL 缓存，翻页时不用每页都 COUNT(*) 一次
+    """
+    ttl = current_app.config["PAGINATION_COUNT_TTL"]
+    if ttl <= 0:
+        return query.order_by(None).count()
+
+    total: int | None = count_cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(key, total, ttl=ttl)
+    return total
+
+
+def paginate(query, count_key: Hashable, id_column, sort_column=None, descending: bool = False) -> Page:
+    """
+    分页查询，按 (sort_column, id_column) 排序，sort_column 为空时只按 id_column 排序
+    请求带 ?after= 时使用游标模式：按上一页最后一行的排序值定位，第一页传空字符串，
+    不需要 OFFSET 扫描；否则按 ?page= 页码分页，和原来的接口兼容
+    """
+    per_page = max(request.args.get("size", 10, type=int), 1)  # 获取每页条数，默认为 10
+    total = cached_count(count_key, query)
+
+    if sort_column is None or sort_column is id_column:
+        order_by = [id_column.desc() if descending else id_column.asc()]
+        sort_column = None
+    else:
+        order_by = [
+            sort_column.desc() if descending else sort_column.asc(),
+            id_column.desc() if descending else id_column.asc(),
+        ]
+    query = query.order_by(*order_by)
+
+    after = request.args.get("after")
+    if after is None:
+        pagination = query.paginate(per_page=per_page, error_out=False, count=False)
+        return Page(pagination.items, pagination.per_page, total, pagination.page, None)
+
+    if after:
+        sort_value, last_id = decode_cursor(after, id_column if sort_column is None else sort_column)
+        if sort_column is None:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(
+                or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))
+            )
+        else:
+            query = query.filter(
+                or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+            )
+
+    # 多取一行判断是否还有下一页
+    items = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        sort_key = id_column.key if sort_column is None else sort_column.key
+        next_cursor = encode_cursor(getattr(last, sort_key), getattr(last, id_column.key))
+    return Page(items, per_page, total, None, next_cursor)
@@ -0,0 +1,50 @@
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any
+
+
+class ProcessPool:
+    """
+    第一次使用时创建的进程池，gunicorn fork 出来的 worker 各自拥有自己的进程池
+    子进程被杀掉（例如 OOM）后整个进程池会失效，这时丢弃旧的进程池，重建后重试一次
+    """
+
+    def __init__(self):
+        self._executor: ProcessPoolExecutor | None = None
+        self._owner_pid: int | None = None
+        self._lock = Lock()
+
+    def _get_executor(self, workers: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._owner_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._owner_pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # 并发的请求可能已经重建过了，只丢弃自己用过的那个
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_all(self, workers: int, fn: Callable, args_list: list[tuple]) -> list[Any]:
+        """
+        把每组参数交给进程池执行，返回结果和 args_list 一一对应
+        """
+        for attempt in range(2):
+            executor = self._get_executor(workers)
+            try:
+                futures = [executor.submit(fn, *args) for args in args_list]
+                return [future.result() for future in futures]
+            except BrokenProcessPool:
+                self._discard(executor)
+                if attempt == 1:
+                    raise
+        return []  # 不会执行到这里
+
+    def run(self, workers: int, fn: Callable, *args) -> Any:
+        return self.run_all(workers, fn, [args])[0]
@@ -1,15 +1,16 @@
 from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 from typing import cast
 from myapp import db
 from myapp.db_model import (
-    Question,
     Response,
     Survey,
+    SurveyRevision,
     User,
     ResponseScore,
 )
+from myapp.utils import response_expire_cutoff, response_expired
 
 query = Blueprint("query", __name__)
 
@@ -28,41 +29,55 @@ def response():
     """
     user: User = cast(User, current_user)
 
+    # 满分取作答时冻结的问卷版本，旧答卷没有记录版本，取问卷当前的满分
     top_10_responses = (
-        db.session.query(Response)
-        .filter_by(user_id=user.id)
+        db.session.query(
+            Response.id,
+            Response.survey_name,
+            Response.response_time,
+            Response.is_completed,
+            Response.is_reviewed,
+            Response.create_time,
+            Response.archive_score,
+            func.coalesce(SurveyRevision.full_score, Survey.full_score, 0).label("full_score"),
+        )
+        .outerjoin(SurveyRevision, SurveyRevision.id == Response.revision_id)
+        .outerjoin(Survey, Survey.id == Response.survey_id)
+        .filter(Response.user_id == user.id)
         .order_by(desc(Response.id))  # 按 id 降序排序
         .limit(10)  # 取前 10 条答卷
         .all()
     )
 
+    # 被批改完的卷子直接使用归档的总分，其余的一次聚合出得分
+    unarchived_ids = [res.id for res in top_10_responses if res.archive_score is None]
+    earned_scores: dict[int, float] = {}
+    if unarchived_ids:
+        earned_scores = dict(
+            db.session.query(ResponseScore.response_id, func.sum(ResponseScore.score))
+            .filter(ResponseScore.response_id.in_(unarchived_ids))
+            .group_by(ResponseScore.response_id)
+            .all()
+        )
+
+    # 超时未提交、还没被定时任务标记的答卷按已拒绝显示
+    cutoff = response_expire_cutoff()
     response_data: list = []
     for res in top_10_responses:
-        # 计算得分是多少
-        # 如果是被批改完的卷子，就直接调取总分，否则计算一遍
-        total_score: float = 0
-
         if res.archive_score is None:
-            scores = ResponseScore.query.filter_by(response_id=res.id).all()
-            total_score = sum(score.score for score in scores)  # 计算总分
-
+            total_score: float = earned_scores.get(res.id, 0)
         else:
             total_score = res.archive_score
 
-
-        # 计算满分是多少
-        questionnaire: list = Question.query.filter_by(survey_id=res.survey_id).all()
-        full_score = sum(question.score for question in questionnaire)
-
         # 构造返回数据
         response_data.append(
             {
                 "id": res.id,
                 "survey_name": res.survey_name,
                 "responseTime": res.response_time,
-                "state": res.is_reviewed,
+                "state": 2 if response_expired(res.is_completed, res.create_time, cutoff) else res.is_reviewed,
                 "get_score": total_score,
-                "full_score": full_score,
+                "full_score": res.full_score,
             }
         )
 
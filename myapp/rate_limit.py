@@ -0,0 +1,110 @@
+import os
+import random
+import sqlite3
+import time
+from functools import wraps
+from threading import local
+
+from flask import current_app, jsonify
+
+from myapp.utils import get_client_ip
+
+
+class RateLimiter:
+    """
+    基于 GCRA（漏桶的一种等价实现）的限流器，每个 key 只保存一个“理论到达时间” tat
+    计数保存在本地 SQLite 文件里，同一台机器上的多个 gunicorn worker 共享同一份计数，重启后也不会丢失
+    每次判断只是一次本地文件事务，不会访问 MySQL
+    """
+
+    def __init__(self):
+        self._local = local()
+
+    def _connect(self) -> sqlite3.Connection:
+        path = current_app.config["RATE_LIMIT_STORAGE"] or os.path.join(
+            current_app.instance_path, "rate_limit.sqlite3"
+        )
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "path", None) != path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            self._local.conn = conn
+            self._local.path = path
+        return conn
+
+    def hit(self, key: str, limit: int, period: float) -> bool:
+        """
+        记录一次请求，period 秒内超过 limit 次时返回 False
+        """
+        interval = period / limit
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM buckets WHERE key = ?", (key,)).fetchone()
+            tat = max(row[0], now) if row else now
+            new_tat = tat + interval
+            allowed = new_tat - now <= period
+            if allowed:
+                conn.execute(
+                    "INSERT INTO buckets (key, tat) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET tat = excluded.tat",
+                    (key, new_tat),
+                )
+            # 偶尔顺带清理早已恢复满额的 key，避免文件无限增长
+            if random.random() < 0.001:
+                conn.execute("DELETE FROM buckets WHERE tat < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+
+limiter: RateLimiter = RateLimiter()
+
+
+def parse_rule(rule: str) -> tuple[int, int]:
+    """
+    限流规则的格式为 “次数/秒数”，例如 10/60 代表每分钟 10 次
+    格式错误或者次数、秒数不是正整数时抛出 ValueError
+    """
+    limit, period = rule.split("/")
+    limit, period = int(limit), int(period)
+    if limit <= 0 or period <= 0:
+        raise ValueError(f"次数和秒数必须大于 0: {rule}")
+    return limit, period
+
+
+def rate_limit(config_key: str):
+    """
+    按客户端 IP 限流，规则从 config_key 对应的配置读取，配置为空时不限制
+    需要放在 login_required 之前，这样被拒绝的请求连 token 都不用查
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            rule = current_app.config.get(config_key)
+            if rule:
+                try:
+                    limit, period = parse_rule(rule)
+                except ValueError:
+                    # 配置写错时放行，否则登录接口也会报错，管理员就没法登录后台改回来
+                    current_app.logger.warning(f"限流规则 {config_key}={rule!r} 格式错误，已跳过")
+                    return f(*args, **kwargs)
+                try:
+                    allowed = limiter.hit(f"{f.__name__}:{get_client_ip()}", limit, period)
+                except sqlite3.Error as e:
+                    # 限流存储出问题时放行，不影响正常业务
+                    current_app.logger.warning(f"限流存储不可用: {e}")
+                    allowed = True
+                if not allowed:
+                    return jsonify({"code": 5, "desc": "请求过于频繁，请稍后再试!"}), 429
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,56 @@
+import json
+
+from sqlalchemy.exc import IntegrityError
+
+from myapp import db
+from myapp.cache import TTLCache
+from myapp.db_model import Survey, SurveyRevision
+from myapp.survey_loader import build_survey_content
+
+# revision_id -> 问卷内容，版本写入后不会再变化，只受 LRU 淘汰影响
+# 返回的 dict 是共享的，调用方不能修改
+revision_cache: TTLCache = TTLCache(maxsize=128)
+
+
+def freeze_revision(survey_id: int) -> SurveyRevision | None:
+    """
+    冻结问卷当前的内容，同一个版本号已经冻结过时直接返回已有的记录
+    由调用方负责 commit
+    多个请求同时冻结同一个版本时只有一个能写入，其余的撞上唯一索引后回滚到保存点，改为读取已写入的记录
+    """
+    survey: Survey | None = db.session.get(Survey, survey_id)
+    if survey is None:
+        return None
+
+    revision: SurveyRevision | None = SurveyRevision.query.filter_by(
+        survey_id=survey_id, version=survey.version
+    ).first()
+    if revision is None:
+        survey_content = build_survey_content(survey)
+        content = json.dumps(survey_content, ensure_ascii=False, separators=(",", ":"))
+        full_score = sum(question["score"] for question in survey_content["questions"])
+        revision = SurveyRevision(
+            survey_id=survey_id, version=survey.version, content=content, full_score=full_score
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(revision)
+        except IntegrityError:
+            # MySQL 可重复读下普通 SELECT 看不到其他事务刚提交的行，需要加锁读取最新的数据
+            revision = (
+                SurveyRevision.query.filter_by(survey_id=survey_id, version=survey.version)
+                .with_for_update(read=True)
+                .first()
+            )
+    return revision
+
+
+def load_revision(revision_id: int) -> dict | None:
+    content: dict | None = revision_cache.get(revision_id)
+    if content is None:
+        row = db.session.query(SurveyRevision.content).filter(SurveyRevision.id == revision_id).first()
+        if row is None:
+            return None
+        content = json.loads(row.content)
+        revision_cache.set(revision_id, content)
+    return content
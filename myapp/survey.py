@@ -1,25 +1,28 @@
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from threading import Thread
 from typing import cast
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, send_file
 from flask_login import current_user, login_required
+from sqlalchemy import insert
 
 from myapp import db, APP
 from myapp.db_model import (
-    Option,
-    Question,
     QuestionCategory,
     SurveySlot,
     Response,
-    ResponseDetail,
     ResponseScore,
-    Survey,
     User,
     Whitelist,
 )
+from myapp.answer_key import QuestionKey, revision_answer_key, score_answer, survey_answer_key
+from myapp.answers import normalize_answers, save_answers
+from myapp.compress import mark_cacheable
+from myapp.image_store import image_exists, image_path, sniff_mimetype
 from myapp.mail import survey_complete_mail, send_mail
-from myapp.utils import is_survey_response_expired, status_check
+from myapp.revision import freeze_revision
+from myapp.survey_cache import get_revision_snapshot, get_survey_snapshot, survey_response
+from myapp.utils import find_open_response, response_deadline, status_check
 
 survey = Blueprint("survey", __name__)
 
@@ -44,78 +47,62 @@ def get_all_question_type():
             }
         )
 
-    return jsonify(res_data)
+    # 插槽列表很少变化，相同内容的压缩结果会被复用
+    return mark_cacheable(jsonify(res_data))
 
 
 @survey.route("/survey/<int:sid>", methods=["GET"])
 @login_required
 def get_survey(sid: int):
     user: User = cast(User, current_user)
-
-    # 查询指定问卷
-    survey = Survey.query.get(sid)
-    if not survey:
+    open_response: Response | None = find_open_response(user.id)
+
+    # 记录了问卷版本的答卷使用冻结的内容，旧答卷使用问卷当前的内容
+    snapshot = None
+    if open_response is not None and open_response.revision_id and open_response.survey_id == sid:
+        snapshot = get_revision_snapshot(open_response.revision_id)
+    if snapshot is None:
+        snapshot = get_survey_snapshot(sid)
+    if snapshot is None:
         return jsonify({"code": 1, "desc": "未找到问卷"}), 404
 
-    existing_response_list = user.responses
-    for i in existing_response_list:
-        if i.is_completed is False:
-            create_time = i.create_time
-            break
-    else:
+    if open_response is None:
         return jsonify({"code": 1, "desc": "错误"})
+    create_time = open_response.create_time
 
-    ddl = create_time + timedelta(hours=24)
-
-    # 构建问卷数据结构
-    survey_data = {
-        "id": survey.id,
-        "name": survey.name,
-        "description": survey.description,
-        "create_time": create_time,
-        "ddl": ddl,
-        "status": survey.status,
-        "questions": [],
-    }
+    ddl = response_deadline(create_time)
 
-    # 查询问卷中的所有题目
-    for question in survey.questions:
-        # 不返回被逻辑删除的题目
-        if question.logical_deletion:
-            continue
+    # ETag 同时取决于问卷内容和这份答卷的开始时间，内容可能被压缩，使用弱 ETag
+    etag = f"{snapshot.digest}-{int(create_time.timestamp())}"
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        return response
 
-        question_data = {
-            "display_order": question.display_order,
-            "id": question.id,
-            "title": question.question_text,
-            "type": question.question_type,
-            "score": question.score,
-            "img_list": [],
-            "options": [],
-        }
+    response = survey_response(snapshot, create_time=create_time, ddl=ddl)
+    response.set_etag(etag, weak=True)
+    return response
 
-        for img in question.img_list:
-            question_data["img_list"].append({"alt": img.img_alt, "data": img.img_data})
 
-        # 查询题目中的所有选项
-        for option in question.options:
-            if question.question_type == 3 or question.question_type == 4:
-                question_data["options"].append({"id": option.id, "text": "此处作答"})
-                continue
-            question_data["options"].append({"id": option.id, "text": option.option_text})
+@survey.route("/image/<digest>", methods=["GET"])
+def get_image(digest: str):
+    """
+    题目图片，不需要登录，<img> 标签无法携带 Authorization 头
+    文件名就是内容的摘要，内容永远不会变化，可以让浏览器和 CDN 永久缓存
+    """
+    if not image_exists(digest):
+        return jsonify({"code": 1, "desc": "图片不存在"}), 404
 
-        survey_data["questions"].append(question_data)
-    return jsonify(survey_data)
+    path = image_path(digest)
+    with open(path, "rb") as f:
+        mimetype = sniff_mimetype(f.read(16))
 
-
-def incomplete_survey_exist(response_list) -> Response | None:
-    for i in response_list:
-        if i.is_completed is False:
-            expired = is_survey_response_expired(i)
-            if expired is False:
-                return i
-
-    return None
+    # conditional=True 会处理 If-None-Match 和 Range 请求
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=digest, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
 
 
 @survey.route("/check_survey", methods=["POST"])
@@ -123,8 +110,7 @@ def incomplete_survey_exist(response_list) -> Response | None:
 def check_survey():
     user: User = cast(User, current_user)
     # 检查用户是否有未完成的答卷
-    existing_response_list = user.responses
-    res = incomplete_survey_exist(existing_response_list)
+    res = find_open_response(user.id)
 
     if res:
         return jsonify({"code": 1, "desc": "您有未完成问卷！", "response": res.survey_id})
@@ -140,8 +126,7 @@ def start_survey():
     user: User = cast(User, current_user)
 
     # 检查用户是否有未完成的答卷
-    existing_response_list = user.responses
-    res: Response | None = incomplete_survey_exist(existing_response_list)
+    res: Response | None = find_open_response(user.id)
 
     if res:
         return jsonify({"code": 1, "desc": "您有未完成问卷！", "response": res.survey_id})
@@ -160,6 +145,16 @@ def start_survey():
     if is_in_whitelist:
         return jsonify({"code": 2, "desc": "此玩家存在已有白名单! "})
 
+    # 使用插槽挂载时冻结的问卷版本，升级前创建的插槽在第一次使用时补充冻结
+    slot: SurveySlot | None = SurveySlot.query.filter_by(slot_name=slot_name, mounted_survey_id=sid).first()
+    if slot is not None and slot.revision_id is not None:
+        revision_id = slot.revision_id
+    else:
+        revision = freeze_revision(sid)
+        revision_id = None if revision is None else revision.id
+        if slot is not None:
+            slot.revision_id = revision_id
+
     # 创建新的答卷
     new_response = Response(
         user_id=user.id,
@@ -167,6 +162,7 @@ def start_survey():
         survey_name=slot_name,
         player_name=mc_name,
         player_uuid=mc_uuid,
+        revision_id=revision_id,
     )
     db.session.add(new_response)
     db.session.commit()
@@ -183,102 +179,127 @@ def start_survey():
     )
 
 
-def objective_question_scoring(user_response: list[str], question: Question) -> float:
-    # 获取问题的正确选项,列表元素的值为正确选项的ID
-    correct_options: list[int] = [option.id for option in question.options if option.is_correct]
-
-    if question.question_type == QuestionCategory.SINGLE_CHOICE.value:
-        if int(user_response[0]) in correct_options:
-            return question.score
-
-    elif question.question_type == QuestionCategory.MULTIPLE_CHOICE.value:
-        user_response_int: list[int] = [int(option) for option in user_response]
-        if set(user_response_int) == set(correct_options):
-            return question.score
-
-    elif question.question_type == QuestionCategory.FILL_IN_THE_BLANKS.value:
-        new_user_response: str = user_response[0]
-        correct_answer_id: int = correct_options[0]
-        option: Option | None = Option.query.get(correct_answer_id)
-        if option is not None:
-            correct_answer: str = option.option_text
-            if new_user_response == correct_answer:
-                return question.score
-
-    return 0
-
-
-def make_answer_details(
-    user_response: list[str], question: Question, response_id: int, question_id: int
-) -> list[ResponseDetail]:
-    if question.question_type == QuestionCategory.MULTIPLE_CHOICE.value:
-        return [
-            ResponseDetail(
-                response_id=response_id,
-                question_id=question_id,
-                answer=answer,
-            )
-            for answer in user_response
-        ]
-    else:
-        return [
-            ResponseDetail(
-                response_id=response_id,
-                question_id=question_id,
-                answer=user_response[0],
-            )
-        ]
-
-
 @survey.route("/complete_survey", methods=["POST"])
 @login_required
 def complete_survey():
     data = request.get_json()
     user: User = cast(User, current_user)
-    res: Response | None = incomplete_survey_exist(user.responses)
+
+    # 客户端重试时带上相同的 Idempotency-Key，直接返回第一次提交的结果，不会重复评分和发送邮件
+    idempotency_key: str | None = request.headers.get("Idempotency-Key") or None
+    if idempotency_key is not None:
+        if len(idempotency_key) > 64:
+            return jsonify({"code": 1, "desc": "Idempotency-Key 过长！"}), 400
+        replay = submitted_result(user.id, idempotency_key)
+        if replay is not None:
+            return replay
+
+    res: Response | None = find_open_response(user.id)
     if res is None:
         return jsonify({"code": 1, "desc": "问卷未找到！"}), 400
 
     response_id: int = res.id  # 答卷ID
 
+    # 按作答时冻结的问卷版本评分，旧答卷没有记录版本，按题目当前的内容评分
+    # 答案表编译后缓存在内存里，整份答卷的评分不需要逐题查询
+    answer_key: dict[int, QuestionKey] | None = None
+    if res.revision_id is not None:
+        answer_key = revision_answer_key(res.revision_id)
+    if answer_key is None:
+        answer_key = survey_answer_key(res.survey_id)
+
     # 客观题分数
     count_score: float = 0
+    score_rows: list[dict] = []
+    answers: dict[int, list[str]] = {}
 
     for i in data:
-        question_id: int = i.get("id")  # 问题ID
-        answer: list | None = i.get("answer")  # 用户答案
+        user_response: list | None = i.get("answer")  # 用户答案
 
         # 允许空题
-        if answer is None:
+        if not user_response:
+            continue
+
+        try:
+            question_id: int = int(i.get("id"))  # 问题ID
+        except (TypeError, ValueError):
             continue
 
-        question: Question | None = Question.query.get(question_id)
+        question: QuestionKey | None = answer_key.get(question_id)
 
         # 如果这道题已经被删除，就算了
         if question is None:
             continue
 
+        # 选择题的答案不是选项 ID 时按未作答处理，不评分也不保存
+        values: list[str] = normalize_answers(user_response, question.type)
+        if not values:
+            continue
+
         # 累加分数
-        score_ = objective_question_scoring(answer, question)
+        score_ = score_answer(question, values)
         count_score += score_
-        if score_ != 0:
-            db.session.add(ResponseScore(question.score, question.id, response_id))
-        else:
-            db.session.add(ResponseScore(0, question.id, response_id))
-        # 创建答题详情
-        for detail in make_answer_details(answer, question, response_id, question_id):
-            db.session.add(detail)
-
-    # 标记答卷为已完成
-    res.is_completed = True
-    res.response_time = datetime.now(timezone.utc)
+        score_rows.append({
+            "score": question.score if score_ != 0 else 0,
+            "question_id": question_id,
+            "response_id": response_id,
+        })
+        # 记录答题详情
+        answers.setdefault(question_id, []).extend(values)
+
+    # 用带条件的 UPDATE 占用答卷，并发的重复提交会等这一行的锁释放，然后更新 0 行
+    response_time = datetime.now(timezone.utc)
+    claimed = (
+        db.session.query(Response)
+        .filter(Response.id == response_id, Response.is_completed == False)
+        .update(
+            {
+                "is_completed": True,
+                "response_time": response_time,
+                "idempotency_key": idempotency_key,
+                "submitted_score": count_score,
+            },
+            synchronize_session=False,
+        )
+    )
+    if claimed == 0:
+        db.session.rollback()
+        if idempotency_key is not None:
+            replay = submitted_result(user.id, idempotency_key)
+            if replay is not None:
+                return replay
+        return jsonify({"code": 1, "desc": "问卷已提交！"}), 409
+
+    # 分数用一条多行 INSERT 写入，答题详情按 RESPONSE_PACKED_ANSWERS 打包或者逐行写入，都不经过 ORM 的 identity map
+    if score_rows:
+        db.session.execute(insert(ResponseScore.__table__).values(score_rows))
+    save_answers(response_id, answers)
     db.session.commit()
 
-    send_survey_complete(user.username, res.response_time.isoformat(), res.id)
+    send_survey_complete(user.username, response_time.isoformat(), response_id)
 
     return jsonify({"code": 0, "desc": "提交成功！", "score": count_score}), 200
 
 
+def submitted_result(user_id: int, idempotency_key: str):
+    """
+    按 Idempotency-Key 查找已经提交的答卷，返回和第一次提交相同的结果，没有时返回 None
+    得分使用提交时保存的 submitted_score，之后管理员修改题目得分不会改变重试拿到的结果
+    """
+    submitted = (
+        db.session.query(Response.submitted_score)
+        .filter(
+            Response.user_id == user_id,
+            Response.idempotency_key == idempotency_key,
+            Response.is_completed == True,
+        )
+        .first()
+    )
+    if submitted is None:
+        return None
+    return jsonify({"code": 0, "desc": "提交成功！", "score": submitted.submitted_score}), 200
+
+
 def send_survey_complete(username: str, response_time: str, id_: int):
     with APP.app_context():
         admins: list[User] = User.query.filter_by(role='admin').all()
@@ -0,0 +1,129 @@
+import hashlib
+from typing import NamedTuple
+
+from flask import Response, current_app
+
+from myapp import db
+from myapp.cache import TTLCache
+from myapp.compress import deflate_tail, gzip_splice, negotiate_encoding
+from myapp.db_model import Survey
+from myapp.image_store import image_json
+from myapp.revision import load_revision
+from myapp.survey_loader import build_survey_content
+
+
+class SurveySnapshot(NamedTuple):
+    body: bytes  # 编码好的 JSON（和 jsonify 一样以换行结尾），去掉了开头的 "{"，前面拼上每个用户自己的字段即可
+    digest: str
+
+
+# ("version", survey_id, version, PUBLIC_BASE_URL) 或 ("revision", revision_id, PUBLIC_BASE_URL) -> SurveySnapshot
+# 版本号变化后旧条目不会再被命中，等待 LRU 淘汰；冻结的问卷版本本身就不会变化
+# 图片地址由 PUBLIC_BASE_URL 生成，和请求的 Host 无关，修改配置后旧条目不会再被命中
+snapshot_cache: TTLCache = TTLCache(maxsize=64)
+# SurveySnapshot.digest -> 问卷部分压缩好的裸 deflate 数据
+gzip_tails: TTLCache = TTLCache(maxsize=64)
+
+
+def build_survey_data(content: dict) -> dict:
+    """
+    由问卷内容构建答题时返回的数据，去掉正确答案，不包含 create_time、ddl 这类每个用户不同的字段
+    """
+    survey_data = {
+        "id": content["id"],
+        "name": content["name"],
+        "description": content["description"],
+        "status": content["status"],
+        "questions": [],
+    }
+
+    for question in content["questions"]:
+        question_data = {
+            "display_order": question["display_order"],
+            "id": question["id"],
+            "title": question["title"],
+            "type": question["type"],
+            "score": question["score"],
+            "img_list": [image_json(img) for img in question["img_list"]],
+            "options": [],
+        }
+
+        for option in question["options"]:
+            if question["type"] == 3 or question["type"] == 4:
+                question_data["options"].append({"id": option["id"], "text": "此处作答"})
+                continue
+            question_data["options"].append({"id": option["id"], "text": option["text"]})
+
+        survey_data["questions"].append(question_data)
+    return survey_data
+
+
+def encode_snapshot(content: dict) -> SurveySnapshot:
+    encoded = current_app.json.dumps(build_survey_data(content), separators=(",", ":")).encode("utf-8") + b"\n"
+    return SurveySnapshot(encoded[1:], hashlib.sha256(encoded).hexdigest()[:32])
+
+
+def get_survey_snapshot(sid: int) -> SurveySnapshot | None:
+    """
+    问卷当前内容的快照，用于没有记录问卷版本的旧答卷
+    每次请求只查询一次问卷的版本号，版本号没变时直接返回缓存的字节串
+    版本号存在数据库里，多个 worker 各自缓存也不会读到旧内容
+    """
+    version: int | None = db.session.query(Survey.version).filter(Survey.id == sid).scalar()
+    if version is None:
+        return None
+
+    key = ("version", sid, version, current_app.config["PUBLIC_BASE_URL"])
+    snapshot: SurveySnapshot | None = snapshot_cache.get(key)
+    if snapshot is None:
+        survey: Survey | None = db.session.get(Survey, sid)
+        if survey is None:
+            return None
+        snapshot = encode_snapshot(build_survey_content(survey))
+        snapshot_cache.set(key, snapshot)
+    return snapshot
+
+
+def get_revision_snapshot(revision_id: int) -> SurveySnapshot | None:
+    """
+    冻结的问卷版本的快照，命中缓存时不查询数据库
+    """
+    key = ("revision", revision_id, current_app.config["PUBLIC_BASE_URL"])
+    snapshot: SurveySnapshot | None = snapshot_cache.get(key)
+    if snapshot is None:
+        content = load_revision(revision_id)
+        if content is None:
+            return None
+        snapshot = encode_snapshot(content)
+        snapshot_cache.set(key, snapshot)
+    return snapshot
+
+
+def render_prefix(**fields) -> bytes:
+    """
+    每个用户自己的字段，拼在缓存的问卷前面
+    默认的 JSON 序列化会按 key 排序，create_time、ddl 本来就排在最前面，拼出来的结果和直接 jsonify 一致
+    """
+    prefix = current_app.json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    return prefix[:-1] + b","
+
+
+def survey_response(snapshot: SurveySnapshot, **fields) -> Response:
+    """
+    客户端接受 gzip 时，问卷部分使用预先压缩好的数据，每次请求只压缩很短的前缀
+    """
+    prefix = render_prefix(**fields)
+    response = current_app.response_class(mimetype="application/json")
+    if len(prefix) + len(snapshot.body) >= current_app.config["COMPRESS_MIN_SIZE"]:
+        response.vary.add("Accept-Encoding")
+        if negotiate_encoding(["gzip"]) == "gzip":
+            tail: bytes | None = gzip_tails.get(snapshot.digest)
+            if tail is None:
+                tail = deflate_tail(snapshot.body)
+                gzip_tails.set(snapshot.digest, tail)
+            response.set_data(gzip_splice(prefix, snapshot.body, tail))
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+
+    response.set_data(prefix + snapshot.body)
+    return response
@@ -0,0 +1,52 @@
+from sqlalchemy.orm import selectinload
+
+from myapp.db_model import Question, Survey
+from myapp.image_store import image_record
+
+
+def load_questions(survey_id: int, include_deleted: bool = False) -> list[Question]:
+    """
+    一次取出问卷下的题目，并用 selectinload 批量加载选项和图片
+    无论题目有多少道，固定只执行三条查询
+    :param include_deleted: 是否包含被逻辑删除的题目，默认在 SQL 里就过滤掉
+    """
+    query = (
+        Question.query.filter(Question.survey_id == survey_id)
+        .options(selectinload(Question.options), selectinload(Question.img_list))
+        .order_by(Question.id)
+    )
+    if not include_deleted:
+        query = query.filter(Question.logical_deletion.is_not(True))
+    return query.all()
+
+
+def build_survey_content(survey: Survey, include_deleted: bool = False) -> dict:
+    """
+    把问卷当前的内容整理成普通的 dict，包含正确答案，冻结问卷版本时原样保存为 JSON
+    """
+    return {
+        "id": survey.id,
+        "name": survey.name,
+        "description": survey.description,
+        "status": survey.status,
+        "questions": [question_record(question) for question in load_questions(survey.id, include_deleted)],
+    }
+
+
+def question_record(question: Question) -> dict:
+    """
+    题目转换为普通的 dict，问卷版本里保存的就是这个格式
+    """
+    return {
+        "id": question.id,
+        "display_order": question.display_order,
+        "title": question.question_text,
+        "type": question.question_type,
+        "score": question.score,
+        "deleted": bool(question.logical_deletion),
+        "img_list": [image_record(img) for img in question.img_list],
+        "options": [
+            {"id": option.id, "text": option.option_text, "is_correct": option.is_correct}
+            for option in question.options
+        ],
+    }
@@ -0,0 +1,186 @@
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import NamedTuple
+
+import jwt
+from flask import current_app
+from flask_login import UserMixin
+
+from myapp import db
+from myapp.cache import TTLCache
+from myapp.db_model import Token, User, hash_token
+
+
+# 登录 token 的有效期，单位：秒
+TOKEN_LIFETIME = 3600 * 24 * 7
+
+
+class UserSnapshot(NamedTuple):
+    id: int
+    role: str
+    status: int
+
+
+# token 的 sha256 摘要 -> UserSnapshot，只在当前进程内有效
+token_cache: TTLCache = TTLCache(maxsize=10000)
+
+
+class CachedUser(UserMixin):
+    """
+    由 token 缓存还原出来的用户，只带有鉴权需要的 id、role、status
+    访问其它字段时才按主键加载完整的 User，每个请求最多加载一次
+    """
+
+    def __init__(self, snapshot: UserSnapshot):
+        object.__setattr__(self, "id", snapshot.id)
+        object.__setattr__(self, "role", snapshot.role)
+        object.__setattr__(self, "status", snapshot.status)
+        object.__setattr__(self, "_user", None)
+
+    def _load(self) -> User:
+        # session 的 identity map 是弱引用，这里要自己持有加载出来的 User
+        if self._user is None:
+            user: User | None = db.session.get(User, self.id)
+            if user is None:
+                raise AttributeError(f"User {self.id} 不存在")
+            object.__setattr__(self, "_user", user)
+        return self._user
+
+    def __getattr__(self, name: str):
+        # 只有快照里没有的属性才会走到这里
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._load(), name, value)
+
+
+def resolve_token(token_hash: bytes) -> CachedUser | None:
+    """
+    根据 Bearer token 的摘要找到对应的用户，命中缓存时不查询数据库
+    未命中时用一次 join 查询同时取出 token 和用户状态
+    """
+    snapshot: UserSnapshot | None = token_cache.get(token_hash)
+    if snapshot is None:
+        row = (
+            db.session.query(Token.expires_at, Token.is_revoked, User.id, User.role, User.status)
+            .join(User, Token.user_id == User.id)
+            .filter(Token.token_hash == token_hash)
+            .first()
+        )
+        if row is None or row.is_revoked:
+            return None
+
+        ttl = (row.expires_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+        if ttl <= 0:
+            return None
+
+        snapshot = UserSnapshot(row.id, row.role, row.status)
+        token_cache.set(token_hash, snapshot, min(ttl, current_app.config["TOKEN_CACHE_TTL"]))
+
+    return CachedUser(snapshot)
+
+
+def evict_token(token_hash: bytes) -> None:
+    """
+    token 被吊销后调用，同时更新本进程的吊销列表
+    """
+    token_cache.pop(token_hash)
+    revocation_list.revoked.add(token_hash)
+
+
+def evict_user(user_id: int, valid_after: datetime | None = None) -> None:
+    """
+    用户状态、角色、密码发生变化并提交后调用，清掉该用户所有 token 的缓存
+    :param valid_after: 用户的 tokens_valid_after，调用过 revoke_user_tokens 时提交之后才写入本进程的吊销列表
+    """
+    token_cache.pop_if(lambda snapshot: snapshot.id == user_id)
+    if valid_after is not None:
+        # 整体替换而不是原地修改，和 RevocationList.refresh 一致
+        revocation_list.valid_after = {**revocation_list.valid_after, user_id: valid_after_timestamp(valid_after)}
+
+
+def valid_after_timestamp(valid_after: datetime) -> float:
+    """
+    数据库里保存的是不带时区的 UTC 时间，转换为和 JWT 的 iat 一样的时间戳，保留微秒
+    """
+    return valid_after.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationList:
+    """
+    无状态 JWT 模式使用的吊销列表，定期从数据库整体刷新，鉴权时只查内存
+    revoked: 被吊销且尚未过期的 token 的 sha256 摘要
+    valid_after: user_id -> 时间戳（精确到微秒），在此之前签发的 token 全部失效
+    """
+
+    def __init__(self):
+        self.revoked: set[bytes] = set()
+        self.valid_after: dict[int, float] = {}
+        self.refreshed_at: float = 0
+        self._lock = Lock()
+
+    def refresh_if_stale(self) -> None:
+        interval = current_app.config["JWT_REVOCATION_REFRESH"]
+        if time.monotonic() - self.refreshed_at < interval:
+            return
+        with self._lock:
+            if time.monotonic() - self.refreshed_at >= interval:
+                self.refresh()
+
+    def refresh(self) -> None:
+        now = datetime.now(timezone.utc)
+        revoked_tokens = db.session.query(Token.token_hash).filter(
+            Token.is_revoked == True,
+            Token.expires_at > now,
+        ).all()
+        stamps = db.session.query(User.id, User.tokens_valid_after).filter(
+            User.tokens_valid_after > now - timedelta(seconds=TOKEN_LIFETIME)
+        ).all()
+
+        # 整体替换而不是原地修改，读的一方不需要加锁
+        self.revoked = {row.token_hash for row in revoked_tokens}
+        self.valid_after = {row.id: valid_after_timestamp(row.tokens_valid_after) for row in stamps}
+        self.refreshed_at = time.monotonic()
+
+    def is_revoked(self, token_hash: bytes, payload: dict) -> bool:
+        if token_hash in self.revoked:
+            return True
+        return payload["iat"] < self.valid_after.get(payload["user_id"], 0)
+
+
+revocation_list: RevocationList = RevocationList()
+
+
+def resolve_jwt(token: str, token_hash: bytes) -> CachedUser | None:
+    """
+    无状态模式：本地校验签名和有效期，只查询内存中的吊销列表
+    不带 typ=access 的 token（旧版本签发的登录 token、邮件里的重置密码和激活 token）回退到数据库查询，
+    只有 token 表里存在的登录 token 才能通过
+    """
+    try:
+        payload: dict = jwt.decode(
+            token,
+            current_app.config["SECRET_KEY"],
+            algorithms=["HS256"],
+            options={"require": ["exp", "user_id"]},
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+    if payload.get("typ") != "access" or "iat" not in payload or "role" not in payload or "status" not in payload:
+        return resolve_token(token_hash)
+
+    revocation_list.refresh_if_stale()
+    if revocation_list.is_revoked(token_hash, payload):
+        return None
+
+    return CachedUser(UserSnapshot(payload["user_id"], payload["role"], payload["status"]))
+
+
+def revoke_user_tokens(user: User) -> None:
+    """
+    让该用户此前签发的所有 token 在无状态模式下失效，由调用方负责 commit
+    提交之后调用方需要执行 evict_user(user.id, user.tokens_valid_after)，本进程的吊销列表才会立即生效
+    """
+    user.tokens_valid_after = datetime.now(timezone.utc)
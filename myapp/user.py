@@ -2,7 +2,8 @@ from flask import Blueprint, jsonify, request
 from flask_login import current_user, login_required
 
 from myapp import db
-from myapp.db_model import User, Token
+from myapp.db_model import User, Token, hash_token
+from myapp.token_cache import evict_user
 
 user = Blueprint("user", __name__)
 
@@ -10,9 +11,6 @@ user = Blueprint("user", __name__)
 @user.route("/getInfo")
 @login_required
 def getUserInfo():
-    temp = current_user.whitelist
-    play_permission: bool = True if len(temp) > 0 else False
-
     return jsonify(
         {
             "code": 0,
@@ -24,7 +22,7 @@ def getUserInfo():
                 "addtime": current_user.addtime,
                 "avatar": current_user.avatar,
                 "status": current_user.status,
-                "play_permission": play_permission,
+                "play_permission": current_user.play_permission,
             },
         }
     )
@@ -78,11 +76,12 @@ def update_password(uid: int, token: str, new_password: str, old_password: str)
     user: User | None = User.query.get(uid)
 
     if user:
-        token_record: Token | None = Token.query.filter_by(token=token).first()
+        token_record: Token | None = Token.query.filter_by(token_hash=hash_token(token)).first()
 
         user.set_password(new_password)
         db.session.delete(token_record)
         db.session.commit()
+        evict_user(user.id)
         return True
 
     return False
@@ -5,7 +5,6 @@ from typing import cast
 from flask import abort, current_app, request, jsonify
 from flask_login import current_user
 
-from myapp import db
 from myapp.db_model import User, Response
 
 PASSWORD_PATTERN = re.compile(r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[\W_])[A-Za-z\d\W_]{8,16}$")
@@ -57,26 +56,58 @@ def required_role(role: str):
     return decorator
 
 
+def get_client_ip() -> str | None:
+    """
+    X-Forwarded-For 最左边的值由客户端随意填写，不能用作限流的 key
+    经过反向代理时由 ProxyFix 按 PROXY_COUNT 取代理追加的那一跳，写入 remote_addr
+    """
+    return request.remote_addr
+
+
 def check_password(password: str) -> bool:
     return bool(PASSWORD_PATTERN.match(password))
 
 
-def is_survey_response_expired(survey_response: Response) -> bool:
-    val = current_app.config["RESPONSE_VALIDITY_PERIOD"]
-    validity_period = timedelta(hours=val) # 有效期为 24h
-
-    # 只判断未完成的问卷，已完成的问卷不存在“过期”的说法
-    if survey_response.is_completed is False:
-        create_time = survey_response.create_time
-        create_datetime = create_time.replace(tzinfo=timezone.utc)
-        current_datetime = datetime.now(timezone.utc)
-        expired_datetime = create_datetime + validity_period
-        if expired_datetime < current_datetime:
-            survey_response.is_completed = True
-            survey_response.is_reviewed = 2
-            db.session.commit()
-            return True
-    return False
+def response_deadline(create_time: datetime) -> datetime:
+    """
+    答卷的截止时间，create_time 是不带时区的 UTC 时间
+    """
+    return create_time + timedelta(hours=current_app.config["RESPONSE_VALIDITY_PERIOD"])
+
+
+def response_expire_cutoff() -> datetime:
+    """
+    早于这个时间创建的未完成答卷已经过期，和 create_time 一样是不带时区的 UTC 时间
+    """
+    validity_period = timedelta(hours=current_app.config["RESPONSE_VALIDITY_PERIOD"])
+    return datetime.now(timezone.utc).replace(tzinfo=None) - validity_period
+
+
+def find_open_response(user_id: int) -> Response | None:
+    """
+    查找用户未完成且未过期的答卷，过期在 SQL 里按 create_time 判断，不修改数据
+    走 (user_id, is_completed) 索引，和用户答过多少份问卷无关
+    """
+    return (
+        Response.query.filter(
+            Response.user_id == user_id,
+            Response.is_completed == False,
+            Response.create_time >= response_expire_cutoff(),
+        )
+        .order_by(Response.id.desc())
+        .first()
+    )
+
+
+def response_expired(is_completed: bool, create_time: datetime, cutoff: datetime | None = None) -> bool:
+    """
+    未提交且超过 RESPONSE_VALIDITY_PERIOD 的答卷已经过期，在定时任务标记之前按已拒绝处理
+    只读不写，参数可以来自 Response 对象，也可以来自只查询了部分列的结果行
+    """
+    if is_completed is not False:
+        return False
+    return create_time < (response_expire_cutoff() if cutoff is None else cutoff)
+
 
 def validate_json_required_fields(required_fields:dict, data: dict) -> dict:
     """
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+
+
+# 测试使用 SQLite，模型里 MySQL 专有的类型和函数在这里补上
+@compiles(LONGTEXT, "sqlite")
+def compile_longtext(type_, compiler, **kw):
+    return "TEXT"
+
+
+@event.listens_for(Engine, "connect")
+def register_utc_timestamp(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            "utc_timestamp", 0, lambda: datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+        )
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    from myapp import create_app
+
+    app = create_app()
+    app.config["TESTING"] = True
+    app.extensions["mail"].suppress = True  # 提交答卷等接口会给管理员发邮件，测试时不真正发送
+    return app
+
+
+def create_user(app, username: str, role: str = "user") -> dict:
+    """
+    创建一个已激活的用户并登录，返回带 token 的请求头
+    """
+    from myapp import db
+    from myapp.db_model import User
+
+    with app.app_context():
+        user = User(username, "123456789", role).set_password("@12345Test")
+        user.status = 1
+        db.session.add(user)
+        db.session.commit()
+
+    res = app.test_client().post("/auth/login", json={"username": username, "password": "@12345Test"})
+    return {"Authorization": f"Bearer {res.json['token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(app):
+    return create_user(app, "root", "admin")
+
+
+@pytest.fixture
+def user_headers(app, request):
+    """
+    每个测试一个新用户，互不影响未完成的答卷
+    """
+    return create_user(app, f"user-{request.node.name}")
+
+
+@pytest.fixture(scope="session")
+def create_survey(app):
+    """
+    返回创建问卷的函数：每道题是单选题，5 分，带三个选项（第一个正确）和一张外部图片，返回问卷 ID
+    """
+    from myapp import db
+    from myapp.db_model import Option, Question, QuestionImgURL, Survey
+
+    def create(question_count: int) -> int:
+        with app.app_context():
+            survey = Survey(f"问卷 {question_count}", "测试")
+            db.session.add(survey)
+            db.session.flush()
+            for i in range(question_count):
+                question = Question(survey.id, f"题目 {i}", 1, 5, display_order=i + 1)
+                db.session.add(question)
+                db.session.flush()
+                db.session.add_all([Option(question.id, f"选项 {j}", j == 0) for j in range(3)])
+                db.session.add(QuestionImgURL(question.id, "图片", "https://example.com/a.png"))
+            Survey.bump_version(survey.id)
+            db.session.commit()
+            return survey.id
+
+    return create
+
+
+@pytest.fixture(scope="session")
+def start_survey(app):
+    """
+    返回开始作答的函数，返回值是每道题都答对的 complete_survey 请求数据
+    """
+    from myapp.db_model import Option, Question
+
+    def start(headers: dict, sid: int) -> list[dict]:
+        res = app.test_client().post(
+            "/survey/start_survey",
+            json={"sid": sid, "slot_name": "测试", "playerName": "player", "playerUUID": "uuid"},
+            headers=headers,
+        )
+        assert res.json["code"] == 0
+        with app.app_context():
+            correct = dict(
+                Option.query.join(Question, Question.id == Option.question_id)
+                .filter(Question.survey_id == sid, Option.is_correct == True)
+                .with_entities(Option.question_id, Option.id)
+                .all()
+            )
+        return [{"id": question_id, "answer": [option_id]} for question_id, option_id in sorted(correct.items())]
+
+    return start
+
+
+@pytest.fixture
+def statements(app):
+    """
+    记录执行过的 SQL，用来检查一个接口执行了多少条查询
+    """
+    from myapp import db
+
+    executed: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
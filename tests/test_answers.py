@@ -0,0 +1,73 @@
+from myapp import db
+from myapp.answer_key import QuestionKey, answer_key_cache, normalize_blank, score_answer, survey_answer_key
+from myapp.answers import normalize_answers
+from myapp.db_model import Option, Question, Survey
+
+SINGLE = QuestionKey(type=1, score=5, correct=frozenset({11}), blank=None)
+MULTIPLE = QuestionKey(type=2, score=5, correct=frozenset({21, 22}), blank=None)
+BLANK = QuestionKey(type=3, score=5, correct=frozenset({31}), blank=normalize_blank("ABC 123"))
+
+
+def test_normalize_blank_full_width_and_whitespace():
+    assert normalize_blank("ＡＢＣ　１２３") == "ABC 123"
+    assert normalize_blank("  ABC 123\n") == "ABC 123"
+
+
+def test_score_blank():
+    assert score_answer(BLANK, ["ＡＢＣ　１２３"]) == 5
+    assert score_answer(BLANK, [" ABC 123 "]) == 5
+    assert score_answer(BLANK, ["ABC123"]) == 0
+
+
+def test_score_single_choice():
+    assert score_answer(SINGLE, ["11"]) == 5
+    assert score_answer(SINGLE, ["12"]) == 0
+    assert score_answer(SINGLE, ["x"]) == 0
+    assert score_answer(SINGLE, []) == 0
+
+
+def test_score_multiple_choice_is_set_equality():
+    assert score_answer(MULTIPLE, ["22", "21"]) == 5
+    assert score_answer(MULTIPLE, ["21", "22", "21"]) == 5
+    assert score_answer(MULTIPLE, ["21"]) == 0
+    assert score_answer(MULTIPLE, ["21", "22", "23"]) == 0
+    assert score_answer(MULTIPLE, []) == 0
+
+
+def test_normalize_answers_choice_ids():
+    assert normalize_answers([11, 12], 1) == ["11"]
+    assert normalize_answers([" 21", 22], 2) == ["21", "22"]
+    assert normalize_answers(["abc"], 1) == []
+    assert normalize_answers(["21", "1.5"], 2) == []
+    assert normalize_answers([], 2) == []
+
+
+def test_normalize_answers_text():
+    assert normalize_answers(["ＡＢＣ", "extra"], 3) == ["ＡＢＣ"]
+    assert normalize_answers([], 4) == []
+
+
+def test_survey_answer_key_follows_version(app):
+    with app.app_context():
+        survey = Survey("答案缓存", "")
+        db.session.add(survey)
+        db.session.flush()
+        question = Question(survey.id, "单选", 1, 5, display_order=1)
+        db.session.add(question)
+        db.session.flush()
+        first, second = Option(question.id, "A", True), Option(question.id, "B", False)
+        db.session.add_all([first, second])
+        Survey.bump_version(survey.id)
+        db.session.commit()
+
+        answer_key_cache.clear()
+        assert survey_answer_key(survey.id)[question.id].correct == {first.id}
+
+        # 没有修改版本号时继续使用缓存
+        first.is_correct, second.is_correct = False, True
+        db.session.commit()
+        assert survey_answer_key(survey.id)[question.id].correct == {first.id}
+
+        Survey.bump_version(survey.id)
+        db.session.commit()
+        assert survey_answer_key(survey.id)[question.id].correct == {second.id}
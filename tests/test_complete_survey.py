@@ -0,0 +1,56 @@
+from myapp import db
+from myapp.db_model import Response
+
+
+def submit(app, headers, data: list[dict], key: str | None = None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return app.test_client().post("/survey/complete_survey", json=data, headers=headers)
+
+
+def test_replay_returns_submitted_score(app, user_headers, admin_headers, create_survey, start_survey):
+    sid = create_survey(2)
+    data = start_survey(user_headers, sid)
+    data[1]["answer"] = [data[1]["answer"][0] + 1]  # 第二题答错
+
+    res = submit(app, user_headers, data, key="replay")
+    assert res.status_code == 200 and res.json["score"] == 5
+
+    # 提交之后阅卷改分，重试拿到的仍然是第一次提交的结果
+    with app.app_context():
+        response_id = Response.query.filter_by(survey_id=sid).one().id
+    res = app.test_client().post(
+        "/admin/detail_score",
+        json={"score": 5, "questionId": data[1]["id"], "responseId": response_id},
+        headers=admin_headers,
+    )
+    assert res.json["code"] == 0
+
+    res = submit(app, user_headers, data, key="replay")
+    assert res.status_code == 200 and res.json["score"] == 5
+    with app.app_context():
+        assert Response.query.filter_by(survey_id=sid).count() == 1
+
+
+def test_duplicate_claim_is_rejected(app, user_headers, create_survey, start_survey, monkeypatch):
+    from myapp import survey
+
+    sid = create_survey(2)
+    data = start_survey(user_headers, sid)
+    assert submit(app, user_headers, data, key="first").json["score"] == 10
+
+    # 模拟并发的重复提交：查找未完成答卷时还没看到第一次提交，只能靠带条件的 UPDATE 拦住
+    with app.app_context():
+        response_id = Response.query.filter_by(survey_id=sid).one().id
+    monkeypatch.setattr(survey, "find_open_response", lambda user_id: db.session.get(Response, response_id))
+
+    res = submit(app, user_headers, data)
+    assert res.status_code == 409
+    res = submit(app, user_headers, data, key="other")
+    assert res.status_code == 409
+
+    res = submit(app, user_headers, data, key="first")
+    assert res.status_code == 200 and res.json["score"] == 10
+    with app.app_context():
+        response = db.session.get(Response, response_id)
+        assert response.idempotency_key == "first" and response.submitted_score == 10
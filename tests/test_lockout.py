@@ -0,0 +1,23 @@
+from myapp.lockout import LoginLockout
+
+
+def test_spraying_usernames_does_not_evict_locks(app):
+    lockout = LoginLockout()
+    victim = lockout.user_key("victim")
+    with app.app_context():
+        for _ in range(5):
+            lockout.record_failure(victim, 5)
+        assert lockout.remaining(victim) > 0
+
+        # 大量用户名各自达到阈值，锁定记录超过原来 LRU 的容量
+        for i in range(20000):
+            lockout.record_failure(lockout.user_key(f"spray{i}"), 1)
+        assert lockout.remaining(victim) > 0
+
+        # 退避时间继续累加，没有被清零
+        before = lockout.remaining(victim)
+        lockout.record_failure(victim, 5)
+        assert lockout.remaining(victim) > before
+
+        assert lockout.reset(victim)
+        assert lockout.remaining(victim) <= 0
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from myapp import db
+from myapp.db_model import Question, Response, ResponseAnswers, ResponseDetail, ResponseScore, User
+from myapp.revision import revision_cache
+from myapp.survey_cache import get_survey_snapshot, snapshot_cache
+
+
+def create_responses(survey_id: int, response_count: int, reviewer_uid: int) -> None:
+    """
+    每份答卷来自不同的用户，带阅卷人和每道题的得分
+    """
+    question_ids = [question.id for question in Question.query.filter_by(survey_id=survey_id)]
+    for i in range(response_count):
+        user = User(f"user-{survey_id}-{i}")
+        user.password = "-"
+        db.session.add(user)
+        db.session.flush()
+        response = Response(user.id, survey_id, "", f"player{i}", "00000000-0000-0000-0000-000000000000")
+        response.is_completed = True
+        response.is_reviewed = 1
+        response.reviewer_uid = reviewer_uid
+        db.session.add(response)
+        db.session.flush()
+        db.session.add_all([ResponseScore(5, question_id, response.id) for question_id in question_ids])
+    db.session.commit()
+
+
+def test_admin_survey_query_count_does_not_grow(app, admin_headers, statements, create_survey):
+    with app.app_context():
+        small, large = create_survey(2), create_survey(20)
+
+    client = app.test_client()
+    client.get(f"/admin/survey/{small}", headers=admin_headers)  # 先请求一次，token 对应的用户进入缓存
+    counts = []
+    for sid, question_count in ((small, 2), (large, 20)):
+        statements.clear()
+        res = client.get(f"/admin/survey/{sid}", headers=admin_headers)
+        assert len(res.json["questions"]) == question_count
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_survey_snapshot_query_count_does_not_grow(app, statements, create_survey):
+    with app.app_context():
+        small, large = create_survey(2), create_survey(20)
+
+    counts = []
+    for sid in (small, large):
+        snapshot_cache.clear()
+        with app.test_request_context():
+            statements.clear()
+            assert get_survey_snapshot(sid) is not None
+            counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_admin_responses_query_count_does_not_grow(app, admin_headers, statements, create_survey):
+    with app.app_context():
+        small, large = create_survey(2), create_survey(2)
+        reviewer_uid = User.query.filter_by(username="root").one().id
+        create_responses(small, 2, reviewer_uid)
+        create_responses(large, 20, reviewer_uid)
+
+    client = app.test_client()
+    client.get(f"/admin/survey/{small}", headers=admin_headers)  # 先请求一次，token 对应的用户进入缓存
+    counts = []
+    for sid, response_count in ((small, 2), (large, 20)):
+        statements.clear()
+        res = client.get(f"/admin/responses?surveyId={sid}&size=50", headers=admin_headers)
+        assert len(res.json["list"]) == response_count
+        assert all(item["score"] == 10 and item["reviewer_name"] == "root" for item in res.json["list"])
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_admin_detail_query_count_does_not_grow(
+    app, admin_headers, user_headers, statements, create_survey, start_survey
+):
+    client = app.test_client()
+    response_ids = []
+    for question_count in (2, 20):
+        sid = create_survey(question_count)
+        data = start_survey(user_headers, sid)
+        client.post("/survey/complete_survey", json=data, headers=user_headers)
+        with app.app_context():
+            response_ids.append(Response.query.filter_by(survey_id=sid).one().id)
+
+    client.get(f"/admin/detail/{response_ids[0]}", headers=admin_headers)  # 先请求一次，token 对应的用户进入缓存
+    counts = []
+    for response_id, question_count in zip(response_ids, (2, 20)):
+        revision_cache.clear()  # 冷缓存时多一条读取问卷版本的查询
+        statements.clear()
+        res = client.get(f"/admin/detail/{response_id}", headers=admin_headers)
+        assert len(res.json["questions"]) == question_count
+        assert all(question["userGetScore"] == 5 for question in res.json["questions"])
+        counts.append(len(statements))
+    assert counts[0] == counts[1] <= 5
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_complete_survey_insert_count_does_not_grow(
+    app, user_headers, statements, create_survey, start_survey, monkeypatch, packed
+):
+    monkeypatch.setitem(app.config, "RESPONSE_PACKED_ANSWERS", packed)
+    client = app.test_client()
+    inserts = []
+    for question_count in (10, 50, 200):
+        sid = create_survey(question_count)
+        data = start_survey(user_headers, sid)
+        statements.clear()
+        res = client.post("/survey/complete_survey", json=data, headers=user_headers)
+        assert res.json["score"] == 5 * question_count
+        inserts.append(sum(1 for statement in statements if statement.lstrip().upper().startswith("INSERT")))
+
+        with app.app_context():
+            response_id = Response.query.filter_by(survey_id=sid).one().id
+            assert ResponseScore.query.filter_by(response_id=response_id).count() == question_count
+            if packed:
+                answers = json.loads(db.session.get(ResponseAnswers, response_id).answers)
+                assert len(answers) == question_count
+            else:
+                assert ResponseDetail.query.filter_by(response_id=response_id).count() == question_count
+
+    # 分数一条 INSERT，答案一条 INSERT，和题目数量无关
+    assert inserts == [2, 2, 2]
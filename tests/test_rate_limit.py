@@ -0,0 +1,25 @@
+import pytest
+
+from myapp.rate_limit import parse_rule
+
+
+def test_parse_rule():
+    assert parse_rule("10/60") == (10, 60)
+
+
+@pytest.mark.parametrize("rule", ["10/1m", "10", "1/2/3", "0/60", "10/0", "-1/60"])
+def test_parse_rule_rejects_invalid(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
+
+
+@pytest.mark.parametrize("rule", ["10/1m", "0/60", "10/0"])
+def test_invalid_rule_skips_limit(app, rule):
+    old = app.config["RATE_LIMIT_LOGIN"]
+    app.config["RATE_LIMIT_LOGIN"] = rule
+    try:
+        res = app.test_client().post("/auth/login", json={"username": "nobody", "password": "wrong"})
+    finally:
+        app.config["RATE_LIMIT_LOGIN"] = old
+    assert res.status_code == 200
+    assert res.json["code"] == 1
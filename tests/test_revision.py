@@ -0,0 +1,29 @@
+from sqlalchemy import insert
+
+from myapp import db, revision
+from myapp.db_model import Survey, SurveyRevision
+
+
+def test_freeze_revision_reuses_row_written_concurrently(app, monkeypatch):
+    with app.app_context():
+        survey = Survey("并发冻结", "")
+        db.session.add(survey)
+        db.session.commit()
+        survey_id, version = survey.id, survey.version
+
+        build_survey_content = revision.build_survey_content
+
+        def build_and_race(survey):
+            # 模拟另一个请求在本次查询之后、写入之前抢先冻结了同一个版本
+            with db.engine.begin() as conn:
+                conn.execute(
+                    insert(SurveyRevision).values(survey_id=survey_id, version=version, content="{}", full_score=0)
+                )
+            return build_survey_content(survey)
+
+        monkeypatch.setattr(revision, "build_survey_content", build_and_race)
+        frozen = revision.freeze_revision(survey_id)
+        db.session.commit()
+
+        assert frozen is not None and frozen.content == "{}"
+        assert SurveyRevision.query.filter_by(survey_id=survey_id).count() == 1
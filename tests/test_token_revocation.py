@@ -0,0 +1,30 @@
+from myapp import db
+from myapp.db_model import User, hash_token
+from myapp.token_cache import evict_user, resolve_jwt, revocation_list, revoke_user_tokens
+
+
+def test_revocation_covers_tokens_from_the_same_second(app, monkeypatch):
+    from myapp.auth import create_token
+
+    monkeypatch.setitem(app.config, "JWT_STATELESS", True)
+    with app.test_request_context():
+        user = User("revoke-same-second")
+        user.password = "-"
+        user.status = 1
+        db.session.add(user)
+        db.session.commit()
+
+        before = create_token(user)
+        revoke_user_tokens(user)
+        assert user.id not in revocation_list.valid_after  # 提交之前不影响本进程的吊销列表
+        db.session.commit()
+        evict_user(user.id, user.tokens_valid_after)
+        after = create_token(user)
+
+        assert resolve_jwt(before, hash_token(before)) is None
+        assert resolve_jwt(after, hash_token(after)) is not None
+
+        # 从数据库刷新之后结果不变
+        revocation_list.refresh()
+        assert resolve_jwt(before, hash_token(before)) is None
+        assert resolve_jwt(after, hash_token(after)) is not None